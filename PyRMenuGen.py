@@ -10,7 +10,6 @@
 
 import getopt
 import os
-import re
 import sys
 import shutil
 import subprocess
@@ -23,8 +22,12 @@ import traceback
 ################################################
 
 import settings
-from cdi import dataScraperCDI
-from ccd import dataScraperCCD	
+from folders import folderNumber, folderCollisions, folderWidths, freeFolderNames
+from scan import findSubdirs, findImage, scrapeImage, runWithDeadline
+from menu import readListIni, writeListIni, buildIso
+from daemon import runDaemon
+from ingest import ingestImages
+from integrity import checkImage
 
 ###############################################################
 #
@@ -47,11 +50,19 @@ def help():
 	print("		RMENU ./%s/ directory are located" % settings.RMENU_DIR)
 	print("-s --scan	Scan directories and regenerate the LIST.INI file")
 	print("-i --iso	Create the RMENU .iso file")
-	print("-r --rename	Rename directories to the 001-999 standard")
+	print("-r --rename	Rename directories to the 01-99, 001-999 or 0001-9999 standard")
+	print("--ingest SRC...	Copy images (files or directories) in to the next free")
+	print("		folders and add them to the end of the LIST.INI file")
+	print("--timeout	Seconds to wait for each image to be read before giving up")
+	print("		on it and moving on (default %s, 0 to wait forever)" % settings.IMAGE_TIMEOUT)
+	print("--daemon	Keep running, holding the image list in memory and answering")
+	print("		queries on a Unix domain socket")
+	print("--socket	Socket for daemon mode (default %s)" % settings.DAEMON_SOCKET)
 	print("")
 	print("Menu Options:")
 	print("--menu-1	Use the traditional RMENU interface")
 	print("--menu-2	Use the replacement Rmenu Kai interface")
+	print("--menu-all	Build both, as RMENU.iso and RMENUKAI.iso (implies --iso)")
 	print("")
 	print("e.g.")
 	print("%s -d /mnt/sd_card -s" % __file__)
@@ -68,12 +79,22 @@ def help():
 	print("")
 	print("All-in-one: scan the directories, generate the LIST.INI file and then")
 	print("generate the RMENU .iso file.")
+	print("")
+	print("%s -d /mnt/sd_card --ingest ~/saturn/game.cue ~/saturn/other_game/" % __file__)
+	print("")
+	print("Copy new images on to the card, reading the disc data from the source")
+	print("files as they are copied, and add them to the end of the LIST.INI file.")
+	print("")
+	print("%s -d /mnt/sd_card --daemon" % __file__)
+	print("")
+	print("Scan the directories once, then answer list/lookup/regenerate/iso queries")
+	print("from memory, re-scanning only the images that change on the card.")
 	
 def decode_options():
 	""" Parse command line options """
 	
 	try:
-		opts, args = getopt.getopt(sys.argv[1:], "vhsird:", ["help", "verbose", "scan", "iso", "dir=", "menu-1", "menu-2", "rename"])
+		opts, args = getopt.gnu_getopt(sys.argv[1:], "vhsird:", ["help", "verbose", "scan", "iso", "dir=", "menu-1", "menu-2", "menu-all", "rename", "ingest", "daemon", "socket=", "timeout="])
 	except getopt.GetoptError as err:
 		print(str(err))
 		help()
@@ -82,6 +103,9 @@ def decode_options():
 	mode_rename = False
 	mode_scan = False
 	mode_iso = False
+	mode_daemon = False
+	mode_ingest = False
+	socket_path = settings.DAEMON_SOCKET
 	data_dir = None
 	verbose = False
 	mode_menu = 1
@@ -101,10 +125,25 @@ def decode_options():
 			mode_iso = True
 		elif o in ("-d", "--dir"):
 			data_dir = a
+		elif o in ("--ingest"):
+			mode_ingest = True
+		elif o in ("--timeout"):
+			try:
+				settings.IMAGE_TIMEOUT = float(a)
+			except ValueError:
+				print("ERROR: [timeout] must be a number of seconds")
+				go = False
+		elif o in ("--daemon"):
+			mode_daemon = True
+		elif o in ("--socket"):
+			socket_path = a
 		elif o in ("--menu-1"):
 			mode_menu = 1
 		elif o in ("--menu-2"):
 			mode_menu = 2
+		elif o in ("--menu-all"):
+			mode_menu = "all"
+			mode_iso = True
 		else:
 			assert False, "unhandled option"
 
@@ -114,8 +153,13 @@ def decode_options():
 		go = False
 
 	# Check we've selected at least one of the modes
-	if (mode_scan is False) and (mode_iso is False) and (mode_rename is False):
-		print("ERROR: You must choose at least one of the [rename], [scan] or [iso] options")
+	if (mode_scan is False) and (mode_iso is False) and (mode_rename is False) and (mode_daemon is False) and (mode_ingest is False):
+		print("ERROR: You must choose at least one of the [rename], [ingest], [scan], [iso] or [daemon] options")
+		go = False
+	
+	# Check we've been given something to ingest
+	if mode_ingest and len(args) == 0:
+		print("ERROR: You must give at least one image file or directory to [ingest]")
 		go = False
 		
 	if go is False:
@@ -132,9 +176,11 @@ def decode_options():
 	title()
 	print("Dir:		%s" % data_dir)
 	print("RMENU:		%s/%s/" % (data_dir, settings.RMENU_DIR))
+	print("Ingest mode:	%s" % mode_ingest)
 	print("Scan mode:	%s" % mode_scan)
 	print("ISO mode:	%s" % mode_iso)
 	print("Menu type:	%s" % mode_menu)
+	print("Daemon mode:	%s" % mode_daemon)
 	
 	# Check that the directory actually exists
 	print("")
@@ -171,37 +217,27 @@ def decode_options():
 	##################################
 	#
 	# This is rename mode, any directories found that do
-	# not conform with the 000-999 naming convention
-	# will be renamed to the next available numbered
-	# directory, including any spaces in the sequence.
+	# not conform with the 01-99, 001-999 or 0001-9999
+	# naming convention will be renamed to the next available
+	# numbered directory, including any spaces in the sequence.
 	#
 	##################################
 	if mode_rename:
 		print("")
 		print("Finding non-conforming directory names...")
-		dirnumbers = []
-		for d in range(1, 99):
-			d_name = "%02d" % d
-			dirnumbers.append(d_name)
-		for d in range(100, 999):
-			d_name = "%03d" % d
-			dirnumbers.append(d_name)	
-		master_dirnumbers = dirnumbers.copy()
-		
 		dirs = os.listdir(data_dir)
 		dirs.sort()
-		for d in dirs:
-			# Remove any dirnumbers if they already exist in
-			# the just-ran dir list
-			dirnumbers = list(filter((d).__ne__, dirnumbers))
+		dirnumbers = freeFolderNames(dirs)
 		
 		rename_dirs = []
 		for d in dirs:
-			if d in master_dirnumbers:
+			if folderNumber(d) is not None:
 				pass
 			else:
-				new_dirname = dirnumbers[0]
-				dirnumbers.pop(0)
+				new_dirname = next(dirnumbers, None)
+				if new_dirname is None:
+					print("- ERROR, no free directory numbers left for %s" % d)
+					sys.exit(2)
 				src_dir = data_dir + "/" + d
 				dst_dir  = data_dir + "/" + new_dirname
 				rename_dirs.append((src_dir, dst_dir))
@@ -210,6 +246,15 @@ def decode_options():
 			shutil.move(d[0], d[1])
 		print("- OK")
 			
+	##################################
+	#
+	# This is ingest mode, new images are copied in to the
+	# next free numbered directories and added to LIST.INI
+	#
+	##################################
+	if mode_ingest:
+		ingestImages(data_dir, args, verbose)
+			
 	##################################
 	#
 	# This is scan mode - we generate a new LIST.INI at the
@@ -218,12 +263,6 @@ def decode_options():
 	##################################
 	if mode_scan:
 	
-		# Generate a list of valid directory names
-		valid_subdirs = []
-		for i in range(1,999):
-			v = "%03d" % i
-			valid_subdirs.append(v)
-	
 		##########################################
 		#
 		# Find first level subdirectories
@@ -232,23 +271,22 @@ def decode_options():
 		dir_warnings = False
 		print("")
 		print("Finding subdirs...")
-		data_sub_dirs_tuples = os.listdir(data_dir)
-		data_sub_dirs = []
-		for sd in data_sub_dirs_tuples:
-			sd_name = sd
-			# Strip just the directory name off the /really/long/path/where/it/is
-			if '/' in sd_name:
-				sd_name = sd_name.split('/')[-1]
-			if sd_name in ['01', '', "..", ".", "/"]:
-				# Don't record the RMENU directory itself
-				pass
-			else:
-				# Add the subdir to the list
-				if sd_name not in valid_subdirs:
-					print("- WARNING, %s is not a valid directory name for Rhea/Phoebe" % sd_name)
-					dir_warnings = True
-				data_sub_dirs.append(sd_name)
-		data_sub_dirs.sort()
+		data_sub_dirs = findSubdirs(data_dir)
+		for sd_name in data_sub_dirs:
+			if folderNumber(sd_name) is None:
+				print("- WARNING, %s is not a valid directory name for Rhea/Phoebe" % sd_name)
+				dir_warnings = True
+		
+		# Folders such as 05 and 005 (or 001 and the RMENU folder) refer to the same image number
+		for collision in folderCollisions(data_sub_dirs + [settings.RMENU_DIR]):
+			print("- WARNING, %s all refer to the same image number" % ", ".join(collision))
+			dir_warnings = True
+		
+		# Rhea/Phoebe expect every folder to use the same naming scheme
+		widths = folderWidths(data_sub_dirs)
+		if len(widths) > 1:
+			print("- WARNING, image folders use a mix of %s digit names" % " and ".join([str(w) for w in widths]))
+			dir_warnings = True
 		print("- %s subdirs found" % len(data_sub_dirs))
 		
 		if len(data_sub_dirs) == 0:
@@ -258,62 +296,16 @@ def decode_options():
 		##########################################
 		#
 		# We have some subdirs to check, now look for valid image files...
-		# .ccd, .cdi, .mdf, .iso
+		# .ccd, .cdi, .mdf, .cue, .iso
 		#
 		##########################################
 		print("")
 		print("Scanning for images...")
 		image_files = []
 		for sd in data_sub_dirs:
-			full_sd_path = data_dir + "/" + sd
-			sd_has_image = []
-			
-			# List all the files in this subdir
-			files = os.listdir(full_sd_path)
-			for f in files:
-				i = {
-					'dir' : full_sd_path,
-					'subdir' : sd,
-					'filename' : f,
-					'is_cdi' : False,
-					'is_ccd' : False,
-					'is_mdf' : False,
-					'is_iso' : False,
-				}
-				found = False
-				
-				# Match the filename against known (and supported) image types
-				file_match = re.search(".cdi", f, re.IGNORECASE)
-				if file_match:
-					i['is_cdi'] = True
-					found = True
-				file_match = re.search(".img", f, re.IGNORECASE)
-				if file_match:
-					i['is_ccd'] = True
-					found = True
-				file_match = re.search(".mdf", f, re.IGNORECASE)
-				if file_match:
-					i['is_mdf'] = True
-					found = True
-				file_match = re.search(".iso", f, re.IGNORECASE)
-				if file_match:
-					i['is_iso'] = True
-					found = True
-					
-				if found:
-					#if verbose:
-					#	print("- %s [cdi:%s, ccd:%s, mdf:%s, iso:%s]" % (i['filename'], i['is_cdi'], i['is_ccd'], i['is_mdf'], i['is_iso']))
-					# save the data of this image filanem
-					image_files.append(i)
-					
-					# record that this subdir has an image file
-					sd_has_image.append(sd)				
-					
-					# If we found one matching image file, break from the loop for this subdir
-					# we dont want to risk processing more images in the same folder
-					break
-					
-			if sd in sd_has_image:
+			i = findImage(data_dir, sd)
+			if i:
+				image_files.append(i)
 				if verbose:
 					print("- ! %s" % sd)
 			else:
@@ -328,26 +320,82 @@ def decode_options():
 		######################################
 		print("")
 		print("Extracting disc data...")
+		
+		# The last known good data for each image, in case it can't be read this time
+		previous_images = readListIni(data_dir)
+		timed_out_images = []
+		unreadable_images = []
+		stale_images = []
 		images = []
 		for i in image_files:
-			image_data = None
 			if verbose:
 				print("")
 				print("- %s" % i['filename'])
-			if i['is_cdi']:
-				image_data = dataScraperCDI(i, verbose)
-			elif i['is_ccd']:
-				image_data = dataScraperCCD(i, verbose)
-			#elif i['is_mdf']:
-			#	image_data = dataScraperMDF(i, verbose)
-			#elif i['is_iso']:
-			#	image_data = dataScraperISO(i, verbose)
-			else:
-				pass
+			try:
+				finished, image_data = runWithDeadline(scrapeImage, (i, verbose), settings.IMAGE_TIMEOUT)
+				problem = "Timed out after %gs" % settings.IMAGE_TIMEOUT
+			except Exception as e:
+				# A read error on one image shouldn't stop the rest of the card being listed
+				finished, image_data = (False, None)
+				problem = "Unable to extract disc data: %s" % e
+				unreadable_images.append(i['subdir'])
+			if finished is False:
+				if i['subdir'] not in unreadable_images:
+					timed_out_images.append(i['subdir'])
+				if i['subdir'] in previous_images:
+					image_data = previous_images[i['subdir']]
+					stale_images.append(i['subdir'])
+					print("- x %s/%s [%s, using last known entry]" % (i['subdir'], i['filename'], problem))
+				else:
+					print("- x %s/%s [%s, skipped]" % (i['subdir'], i['filename'], problem))
+			elif image_data is None:
+				print("- x %s/%s [No %s disc header found, skipped]" % (i['subdir'], i['filename'], settings.DISC_STRING))
 			if image_data:
-				image_data['subdir'] = i['subdir']
 				images.append(image_data)
 		print("- %s image data records extracted" % len(images))
+		if len(timed_out_images) or len(unreadable_images):
+			print("- %s images timed out, %s unreadable, %s stale entries used" % (len(timed_out_images), len(unreadable_images), len(stale_images)))
+		
+		######################################
+		#
+		# Check each image is complete, using the size given by its
+		# own layout and a few sampled sectors at the end of the data
+		#
+		######################################
+		failed_images = []
+		integrity_timeouts = []
+		if settings.INTEGRITY_CHECK:
+			print("")
+			print("Checking image integrity...")
+			checked = 0
+			unchecked = 0
+			for i in image_files:
+				if i['subdir'] in timed_out_images or i['subdir'] in unreadable_images:
+					# Already reported, don't wait on it again
+					continue
+				try:
+					finished, result = runWithDeadline(checkImage, (i,), settings.IMAGE_TIMEOUT)
+				except Exception as e:
+					finished, result = (True, (False, ["unable to read: %s" % e]))
+				if finished:
+					ok, problems = result
+				else:
+					# Slow rather than damaged, the entry is still listed
+					integrity_timeouts.append(i['subdir'])
+					print("- x %s/%s [Timed out after %gs]" % (i['subdir'], i['filename'], settings.IMAGE_TIMEOUT))
+					continue
+				if ok is None:
+					unchecked += 1
+					if verbose:
+						print("- ? %s/%s [%s]" % (i['subdir'], i['filename'], ", ".join(problems)))
+				elif ok:
+					checked += 1
+					if verbose:
+						print("- ! %s/%s" % (i['subdir'], i['filename']))
+				else:
+					failed_images.append(i['subdir'])
+					print("- x %s/%s [%s]" % (i['subdir'], i['filename'], ", ".join(problems)))
+			print("- %s OK, %s failed, %s could not be checked, %s timed out" % (checked, len(failed_images), unchecked, len(integrity_timeouts)))
 		
 		# Now do the list
 		print("")
@@ -355,37 +403,51 @@ def decode_options():
 		if verbose:
 			for i in images:
 				#print("%s\r\n%s\r\n%s\r\n%s\r\n%s\r\n" % (i['title'], i['number'], i['region'], i['version'], i['date']))
-				print("%s.title=%s" % (i['subdir'], i['title']))
+				if i['subdir'] in stale_images:
+					print("%s.title=%s	<- STALE, IMAGE NOT READ" % (i['subdir'], i['title']))
+				elif i['subdir'] in failed_images:
+					print("%s.title=%s	<- FAILED INTEGRITY CHECK" % (i['subdir'], i['title']))
+				else:
+					print("%s.title=%s" % (i['subdir'], i['title']))
 				print("%s.disc=%s" % (i['subdir'], i['number']))
 				print("%s.region=%s" % (i['subdir'], i['region']))
 				print("%s.version=%s" % (i['subdir'], i['version']))
 				print("%s.date=%s" % (i['subdir'], i['date']))
 			
 		# Write the data out to file
-		f = open(data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.LIST_INI, "w")
-		f.write("01.title=RMENU\r\n")
-		f.write("01.disc=1/1\r\n")
-		f.write("01.region=JTUE\r\n")
-		f.write("01.version=v999\r\n")
-		f.write("01.date=99999999\r\n")
-		for i in images:
-			f.write("%s.title=%s\r\n" % (i['subdir'], i['title']))
-			f.write("%s.disc=%s\r\n" % (i['subdir'], i['number']))
-			f.write("%s.region=%s\r\n" % (i['subdir'], i['region']))
-			f.write("%s.version=%s\r\n" % (i['subdir'], i['version']))
-			f.write("%s.date=%s\r\n" % (i['subdir'], i['date']))
-		f.close()
+		writeListIni(data_dir, images)
 		print("- OK")
 		
 		if dir_warnings:
 			
 			print("WARNING, ")
-			print("WARNING, One or more of your game image directories is not stored in a folder in the range 000-999")
+			print("WARNING, One or more of your game image directories is not stored in a folder in the range 01-9999,")
+			print("WARNING, or more than one folder refers to the same image number (e.g. 05 and 005), or folders use a mix of naming schemes (e.g. 05 and 006).")
 			print("WARNING, This is unlikely to work with Rhea/Saturn. You are advised to rename your folders to the")
 			print("WARNING, standard naming convention of 01-99, 001-999 or 0001-9999.")
 			print("WARNING, ")
 			print("WARNING, The %s file will NOT be accurate (it uses indexed numbers to identify each image on the card)" % settings.LIST_INI)
 		
+		if len(failed_images):
+			print("WARNING, ")
+			print("WARNING, %s image(s) appear to be truncated or damaged and will probably not load:" % len(failed_images))
+			print("WARNING, %s" % ", ".join(failed_images))
+			print("WARNING, Copy these images on to the card again.")
+		
+		if len(timed_out_images) or len(unreadable_images) or len(integrity_timeouts):
+			print("WARNING, ")
+			print("WARNING, %s image(s) could not be read, or not within %g seconds:" % (len(timed_out_images) + len(unreadable_images) + len(integrity_timeouts), settings.IMAGE_TIMEOUT))
+			summary = []
+			for sd in timed_out_images + unreadable_images:
+				if sd in stale_images:
+					summary.append("%s (last known entry used)" % sd)
+				else:
+					summary.append("%s (not listed)" % sd)
+			for sd in integrity_timeouts:
+				summary.append("%s (listed, integrity check timed out)" % sd)
+			print("WARNING, %s" % ", ".join(summary))
+			print("WARNING, Slow or failing reads usually mean the card is failing, consider replacing it.")
+		
 			
 	######################################
 	#
@@ -415,44 +477,21 @@ def decode_options():
 			sys.exit(2)
 		
 		
-		# Copy the correct menu file
-		print("")
-		print("Copying menu file...")
-		if mode_menu == 1:
-			src = data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.RMENU_BIN
-		elif mode_menu == 2:
-			src = data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.RMENUKAI_BIN
+		if mode_menu == "all":
+			menus = sorted(settings.MENU_BINS)
 		else:
-			print("- ERROR, invalid valid for menu file")
+			menus = [mode_menu]
+		if buildIso(data_dir, menus, verbose) is False:
 			sys.exit(2)
-		shutil.copyfile(src, data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/0.BIN")
-		print("- Using %s" % src)
-			
-		# Create the ISO file using mkisofs
-		cmd_dir = "cd '%s'; " % (data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU") 
-		cmd = settings.MKISOFS
-		cmd_args = """ -sysid 'SEGA SATURN' \
--V 'RMENU' \
--volset 'RMENU' \
--publisher 'SEGA ENTERPRISES, LTD.' \
--p 'SEGA ENTREPRISES, LTD.' \
--A 'RMENU' \
--abstract 'ABS.TXT' \
--copyright 'CPY.TXT' \
--biblio 'BIB.TXT' \
--G 'IP.BIN' \
--full-iso9660-filenames \
--input-charset 'iso8859-1' \
--o '%s/%s/RMENU.iso' '%s/%s/BIN/RMENU' """ % (data_dir, settings.RMENU_DIR, data_dir, settings.RMENU_DIR)
-		print("")
-		print("Going to run %s..." % settings.MKISOFS)
-		print("- Running [%s %s]" % (cmd, cmd_args))
-		os.system(cmd_dir + cmd + cmd_args)
 	
-		# We should check the iso has been created here
-		# TODO
-		
-		# Any further checks...
+	######################################
+	#
+	# This is daemon mode, we keep the image list in memory
+	# and answer queries until told to shut down.
+	#
+	######################################
+	if mode_daemon:
+		runDaemon(data_dir, socket_path, verbose)
 	
 if __name__ == "__main__":
     decode_options()
\ No newline at end of file
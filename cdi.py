@@ -1,23 +1,144 @@
 #!/usr/bin/env python3
 
+import os
+import struct
+
 import settings
+from header import decodeHeader, HEADER_FIELDS
+
+# Header fields available in each type of CDI file
+# Type '0' CDI files have the standard disc header layout
+# Type '1' CDI files only have the disc title, at +32 bytes (ripped from bin/cue)
+CDI_FIELDS = {
+	0 : HEADER_FIELDS,
+	1 : [('title', 32, settings.DISC_TITLE_SIZE, "Disc Title")],
+}
+
+# Binary layout of the DiscJuggler descriptor (all little endian)
+# The last 8 bytes of the file are the descriptor version and its offset
+CDI_TRAILER = struct.Struct("<II")
+CDI_COUNT = struct.Struct("<H")
+CDI_VALUE = struct.Struct("<I")
+# Every track block contains this marker twice
+CDI_TRACK_START = b"\x00\x00\x01\x00\x00\x00\xff\xff\xff\xff"
+
+def cdiDescriptor(cdi_filename):
+	""" Find the descriptor of a .CDI file, returns (version, offset), or (None, None) if there is no valid trailer """
+
+	size = os.path.getsize(cdi_filename)
+	if size < CDI_TRAILER.size:
+		return (None, None)
+
+	f = open(cdi_filename, "rb")
+	f.seek(-CDI_TRAILER.size, 2)
+	version, header_offset = CDI_TRAILER.unpack(f.read(CDI_TRAILER.size))
+	f.close()
+
+	if version not in settings.CDI_VERSIONS:
+		return (None, None)
+	if version == settings.CDI_VERSIONS[-1]:
+		# v3.5 stores the descriptor position relative to the end of the file
+		header_offset = size - header_offset
+	return (version, header_offset)
+
+def parseCDI(cdi_filename):
+	""" Parse the tracks of every session from the descriptor at the end of a DiscJuggler .CDI file """
+
+	version, header_offset = cdiDescriptor(cdi_filename)
+	if version is None or header_offset <= 0 or header_offset >= os.path.getsize(cdi_filename):
+		return []
+
+	f = open(cdi_filename, "rb")
+	f.seek(header_offset, 0)
+	cdi_bytes = f.read()
+	f.close()
+
+	####################################
+	#
+	# The track blocks are variable length, so are walked one
+	# field at a time. Track data is stored in the file in the
+	# same order, each track including its pregap.
+	#
+	####################################
+	tracks = []
+	position = 0
+	pos = 0
+	try:
+		sessions = CDI_COUNT.unpack_from(cdi_bytes, pos)[0]
+		pos += CDI_COUNT.size
+		for session in range(0, sessions):
+			track_count = CDI_COUNT.unpack_from(cdi_bytes, pos)[0]
+			pos += CDI_COUNT.size
+			for track in range(0, track_count):
+				# Extra data, from DiscJuggler 3.00.780 on
+				if CDI_VALUE.unpack_from(cdi_bytes, pos)[0]:
+					pos += 8
+				pos += 4
+				if cdi_bytes[pos:pos + 20] != CDI_TRACK_START * 2:
+					return []
+				pos += 24
+				# Filename of the original image
+				pos += 1 + cdi_bytes[pos]
+				pos += 19
+				# Extra data, from DiscJuggler 4 on
+				if CDI_VALUE.unpack_from(cdi_bytes, pos)[0] == 0x80000000:
+					pos += 8
+				pos += 6
+				pregap = CDI_VALUE.unpack_from(cdi_bytes, pos)[0]
+				length = CDI_VALUE.unpack_from(cdi_bytes, pos + 4)[0]
+				pos += 14
+				mode = settings.CDI_MODES.get(CDI_VALUE.unpack_from(cdi_bytes, pos)[0], "AUDIO")
+				pos += 16
+				start_lba = CDI_VALUE.unpack_from(cdi_bytes, pos)[0]
+				total_length = CDI_VALUE.unpack_from(cdi_bytes, pos + 4)[0]
+				pos += 24
+				sector_size = settings.CDI_SECTOR_SIZES[CDI_VALUE.unpack_from(cdi_bytes, pos)[0]]
+				pos += 33
+				if version != settings.CDI_VERSIONS[0]:
+					pos += 5
+					# Extra data, from DiscJuggler 3.00.780 on
+					if CDI_VALUE.unpack_from(cdi_bytes, pos)[0] == 0xFFFFFFFF:
+						pos += 78
+					pos += 4
+
+				# Raw 2448 byte sectors have their subchannel data after the main sector data
+				main_size = min(sector_size, 2352)
+				if mode == "AUDIO" or main_size == 2048:
+					data_offset = 0
+				else:
+					data_offset = settings.CUE_MODES.get("%s/%s" % (mode, main_size), (main_size, 0))[1]
+
+				tracks.append({
+					'number' : len(tracks) + 1,
+					'session' : session + 1,
+					'mode' : mode,
+					'sector_size' : sector_size,
+					'data_offset' : data_offset,
+					'start_sector' : start_lba,
+					'pregap' : pregap,
+					'length' : length,
+					'offset' : position + (pregap * sector_size),
+				})
+				position += total_length * sector_size
+
+			# Session trailer
+			pos += 12
+			if version != settings.CDI_VERSIONS[0]:
+				pos += 1
+	except (struct.error, IndexError, KeyError):
+		# Cut short, or a descriptor layout we don't understand
+		return []
+
+	return tracks
 
 def dataScraperCDI(image_data, verbose):
 	""" Attempt to extract the disc name, version, date etc from a DiscJuggler .CDI image file """
-	
-	disc_data = {
-		'title' : "",
-		'region' : "",
-		'version' : "",
-		'number' : "",
-		'date' : "",
-	}
-	
+
 	f = open(image_data['dir'] + '/' +  image_data['filename'], "rb")
-	
+
 	found = False
 	cdi_type = False
-	
+
 	####################################
 	#
 	# Check for the valid disc string
@@ -35,136 +156,44 @@ def dataScraperCDI(image_data, verbose):
 				print("--- ! [CDI type %s] %s @ %s" % (BASE[0], s, BASE[1]))
 			found = True
 			cdi_type = BASE[0]
-		if found:
-			if verbose > 1:
-				# Print the full 512 byte header
-				f.seek(BASE[1], 0)
-				text_bytes = f.read(512)
-				try:
-					s = text_bytes.decode('ascii')
-				except Exception as e:
-					s = text_bytes
-				print("--- [HEADER] <%s>" % s)
 			break
-			
-	####################################
-	#
-	# Extract a disc title
-	#
-	####################################
+
 	if found is False:
 		f.close()
-		return disc_data
-	else:
-		if cdi_type == 0:
-			# Type '0' CDI files have the disc title at +96 bytes
-			BASE_TITLE_OFFSET = 96
-		else:
-			# Type '1' CDI files have the disc title at +32 bytes
-			BASE_TITLE_OFFSET = 32
-			
-		f.seek(BASE[1] + BASE_TITLE_OFFSET, 0)
-		text_bytes = f.read(settings.DISC_TITLE_SIZE)
-		try:
-			s = text_bytes.decode('ascii').rstrip()
-			disc_data['title'] = s
-		except Exception as e:
-			print("--- x [Disc Title] Unable to extract disc title")
-		if verbose:
-			print("--- ! [Disc Title] %s" % (s))
-			
-	####################################
-	#
-	# Extract a disc region
-	#
-	####################################
-	if cdi_type == 0:
-		# Type '0' CDI files have the disc region at +64 bytes
-		BASE_REGION_OFFSET = 64
-		f.seek(BASE[1] + BASE_REGION_OFFSET, 0)
-		text_bytes = f.read(settings.DISC_REGION_SIZE)
-		try:
-			s = text_bytes.decode('ascii')
-			disc_data['region'] = s
-		except Exception as e:
-			print("--- x [Disc Region] Unable to extract disc region")
-		if verbose:
-			print("--- ! [Disc Region] %s" % (s))
-	else:
-		# Type '1' CDI files dont appear to have region info (ripped from bin/cue)
-		disc_data['region'] = ""
-		if verbose:
-			print("--- x [Disc Region] Not supported on this image type")
-	
+		return None
+
 	####################################
 	#
-	# Extract a disc version
+	# Extract the disc title, region, version and date
 	#
 	####################################
+	f.seek(BASE[1], 0)
+	header_bytes = f.read(settings.DISC_HEADER_SIZE)
 	if cdi_type == 0:
-		# Type '0' CDI files have the disc region at +42 bytes
-		BASE_VERSION_OFFSET = 42
-		f.seek(BASE[1] + BASE_VERSION_OFFSET, 0)
-		text_bytes = f.read(settings.DISC_VERSION_SIZE)
-		try:
-			s = text_bytes.decode('ascii')
-			disc_data['version'] = s
-		except Exception as e:
-			print("--- x [Disc Version] Unable to extract disc version")
-		if verbose:
-			print("--- ! [Disc Version] %s" % (s))
+		disc_data = decodeHeader(header_bytes, verbose, CDI_FIELDS[0])
 	else:
-		# Type '1' CDI files dont appear to have version info (ripped from bin/cue)
-		disc_data['version'] = ""
+		disc_data = decodeHeader(header_bytes, verbose, CDI_FIELDS[1])
 		if verbose:
-			print("--- x [Disc Version] Not supported on this image type")
-	
-	####################################
-	#
-	# Extract a disc date
-	#
-	####################################
-	if cdi_type == 0:
-		# Type '0' CDI files have the disc region at +48 bytes
-		BASE_DATE_OFFSET = 48
-		f.seek(BASE[1] + BASE_DATE_OFFSET, 0)
-		text_bytes = f.read(settings.DISC_DATE_SIZE)
+			print("--- x [Disc Region/Version/Date] Not supported on this image type")
+
+		####################################
+		#
+		# Extract a disc number
+		#
+		####################################
+		# Type '1' CDI files have the disc number at - 5 bytes
+		BASE_NUMBER_OFFSET = -5
+		f.seek(BASE[1] + BASE_NUMBER_OFFSET, 0)
+		text_bytes = f.read(settings.DISC_NUMBER_SIZE)
 		try:
 			s = text_bytes.decode('ascii')
-			disc_data['date'] = s
+			disc_data['number'] = s
+			if verbose:
+				print("--- ! [Disc Number] %s" % (s))
 		except Exception as e:
-			print("--- x [Disc Date] Unable to extract disc date")
-		if verbose:
-			print("--- ! [Disc Date] %s" % (s))
-	else:
-		# Type '1' CDI files dont appear to have version info (ripped from bin/cue)
-		disc_data['date'] = ""
-		if verbose:
-			print("--- x [Disc Date] Not supported on this image type")
-	
-	####################################
-	#
-	# Extract a disc number
-	#
-	####################################
-	if cdi_type == 0:
-		# Type '0' CDI files have the disc number at +59 bytes
-		BASE_NUMBER_OFFSET = 59
-	else:
-		# Type '1' CDI files have the disc title at - 5 bytes
-		BASE_NUMBER_OFFSET = -5
-			
-	f.seek(BASE[1] + BASE_NUMBER_OFFSET, 0)
-	text_bytes = f.read(settings.DISC_NUMBER_SIZE)
-	try:
-		s = text_bytes.decode('ascii')
-		disc_data['number'] = s
-	except Exception as e:
-		print("--- x [Disc Number] Unable to extract disc number")
-	if verbose:
-		print("--- ! [Disc Number] %s" % (s))
-	
+			print("--- x [Disc Number] Unable to extract disc number")
+
 	f.close()
-	
+
 	# Return all found disc data
-	return disc_data
\ No newline at end of file
+	return disc_data
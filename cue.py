@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+import re
+
+import settings
+from header import dataScraperHeader
+
+def findFile(directory, filename):
+	""" Locate a file referenced by a cue sheet, allowing for differences in case """
+
+	if os.path.isfile(directory + '/' + filename):
+		return directory + '/' + filename
+	for f in os.listdir(directory):
+		if f.lower() == filename.lower():
+			return directory + '/' + f
+	return None
+
+def parseCue(cue_filename):
+	""" Parse a cue sheet into a list of tracks, along with the byte offset of each track within its own file """
+
+	tracks = []
+	current_file = None
+	current_track = None
+
+	f = open(cue_filename, "r", encoding = "latin-1")
+	for line in f:
+		line = line.strip()
+
+		file_match = re.match(r'FILE\s+"(.*)"\s+\S+$', line, re.IGNORECASE) or re.match(r'FILE\s+(\S+)\s+\S+$', line, re.IGNORECASE)
+		if file_match:
+			current_file = file_match.group(1)
+			current_track = None
+			continue
+
+		track_match = re.match(r'TRACK\s+(\d+)\s+(\S+)', line, re.IGNORECASE)
+		if track_match:
+			mode = track_match.group(2).upper()
+			if mode not in settings.CUE_MODES:
+				# Unsupported track type (CDG etc) - keep the layout, but never treat it as data
+				mode = "AUDIO"
+			current_track = {
+				'number' : int(track_match.group(1)),
+				'mode' : mode,
+				'file' : current_file,
+				'sector_size' : settings.CUE_MODES[mode][0],
+				'data_offset' : settings.CUE_MODES[mode][1],
+				'indexes' : {},
+			}
+			tracks.append(current_track)
+			continue
+
+		index_match = re.match(r'INDEX\s+(\d+)\s+(\d+):(\d+):(\d+)', line, re.IGNORECASE)
+		if index_match and current_track:
+			# mm:ss:ff, at 75 frames (sectors) per second
+			frames = ((int(index_match.group(2)) * 60) + int(index_match.group(3))) * 75 + int(index_match.group(4))
+			current_track['indexes'][int(index_match.group(1))] = frames
+	f.close()
+
+	####################################
+	#
+	# Convert the frame positions of each track into a byte
+	# offset within its file. Tracks in the same file can have
+	# different sector sizes, so accumulate each one in turn.
+	#
+	####################################
+	last_file = None
+	for t in tracks:
+		if len(t['indexes']) == 0:
+			t['indexes'][1] = 0
+		t['start'] = min(t['indexes'].values())
+		if 1 not in t['indexes']:
+			t['indexes'][1] = t['start']
+		if t['file'] != last_file:
+			# INDEX times are relative to the start of each file
+			position = 0
+			last_start = 0
+			last_size = t['sector_size']
+			last_file = t['file']
+		position += (t['start'] - last_start) * last_size
+		last_start = t['start']
+		last_size = t['sector_size']
+		t['offset'] = position + ((t['indexes'][1] - t['start']) * t['sector_size'])
+
+	return tracks
+
+def dataScraperCUE(image_data, verbose):
+	""" Extract disc data from the first data track of a cue sheet (.cue/.bin or .cue/.iso) image """
+
+	tracks = parseCue(image_data['dir'] + '/' + image_data['filename'])
+
+	####################################
+	#
+	# Find the first data track - audio track files are never opened
+	#
+	####################################
+	data_track = None
+	for t in tracks:
+		if t['mode'] != "AUDIO":
+			data_track = t
+			break
+
+	if data_track is None:
+		print("--- x [CUE] No data track found in %s" % image_data['filename'])
+		return None
+
+	data_filename = findFile(image_data['dir'], data_track['file'])
+	if data_filename is None:
+		print("--- x [CUE] Unable to find track file %s" % data_track['file'])
+		return None
+
+	offset = data_track['offset'] + data_track['data_offset']
+	if verbose:
+		print("--- ! [CUE track %s %s] %s @ %s" % (data_track['number'], data_track['mode'], data_track['file'], offset))
+
+	return dataScraperHeader(data_filename, offset, verbose)
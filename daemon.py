@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+###########################################
+#
+# Daemon mode - holds the scanned image index in memory and
+# answers queries over a Unix domain socket.
+#
+# The protocol is one JSON object per line in each direction:
+#
+#	{"cmd": "list"}
+#	{"cmd": "lookup", "folder": "005"}
+#	{"cmd": "lookup", "title": "Radiant Silvergun"}
+#	{"cmd": "refresh"}
+#	{"cmd": "regenerate"}
+#	{"cmd": "iso", "menu": 2}
+#	{"cmd": "iso", "menu": "all"}
+#	{"cmd": "shutdown"}
+#
+# Every reply has an "ok" key, plus either the result or an "error".
+#
+###########################################
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import traceback
+
+import settings
+from folders import folderNumber
+from scan import findSubdirs, findImage, scrapeImage, runWithDeadline
+from menu import writeListIni, buildIso
+
+def fileStamp(path):
+	""" The filesystem metadata used to decide if a path has changed since it was last scanned """
+
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return (st.st_mtime_ns, st.st_size)
+
+def removeStaleSocket(socket_path):
+	""" Remove a socket left behind by a previous run, refusing to touch anything else """
+
+	try:
+		st = os.stat(socket_path)
+	except FileNotFoundError:
+		return
+	if not stat.S_ISSOCK(st.st_mode):
+		raise OSError("%s exists and is not a socket" % socket_path)
+
+	s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		s.connect(socket_path)
+	except ConnectionRefusedError:
+		# Nothing is listening, safe to replace
+		os.unlink(socket_path)
+		return
+	finally:
+		s.close()
+	raise OSError("another daemon is already listening on %s" % socket_path)
+
+def scrapeAndSignal(i, verbose, done):
+	""" Scrape an image, setting an event once the scrape has finished, however it ends """
+
+	try:
+		return scrapeImage(i, verbose)
+	finally:
+		done.set()
+
+class ImageIndex():
+	""" In-memory index of the images on the card, kept fresh from filesystem metadata """
+
+	def __init__(self, data_dir, verbose):
+		self.data_dir = data_dir
+		self.verbose = verbose
+		self.lock = threading.Lock()
+		self.refresh_lock = threading.Lock()
+		self.dir_stamp = None
+		self.subdirs = []
+		# subdir -> {'stamp', 'image', 'image_stamp', 'data'}
+		self.entries = {}
+		# subdir -> Event, set once a scrape that missed its deadline has finished
+		self.inflight = {}
+		self.images = []
+		self.folders = {}
+		self.titles = {}
+
+	def refresh(self):
+		""" Re-scan only the subdirs and image files whose metadata has changed, returns the number re-scraped """
+
+		# Only one refresh at a time, queries are still answered from the previous index
+		with self.refresh_lock:
+			scraped = 0
+			dir_stamp = fileStamp(self.data_dir)
+			if dir_stamp != self.dir_stamp:
+				# Subdirs have been added, removed or renamed
+				self.subdirs = findSubdirs(self.data_dir)
+				self.dir_stamp = dir_stamp
+
+			entries = {}
+			for sd in self.subdirs:
+				stamp = fileStamp(self.data_dir + "/" + sd)
+				if stamp is None:
+					continue
+				previous = self.entries.get(sd)
+				entry = previous
+				if entry is None or entry['stamp'] != stamp:
+					# Files in this subdir have changed, find the image again
+					entry = {
+						'stamp' : stamp,
+						'image' : findImage(self.data_dir, sd),
+						'image_stamp' : None,
+						'data' : None,
+					}
+				if entry['image']:
+					image_stamp = fileStamp(entry['image']['dir'] + "/" + entry['image']['filename'])
+					if image_stamp != entry['image_stamp'] and sd in self.inflight and not self.inflight[sd].is_set():
+						# The last scrape is still stuck reading, don't pile another thread on top of it
+						if previous:
+							entry['data'] = previous['data']
+					elif image_stamp != entry['image_stamp']:
+						self.inflight.pop(sd, None)
+						done = threading.Event()
+						try:
+							finished, image_data = runWithDeadline(scrapeAndSignal, (entry['image'], self.verbose, done), settings.IMAGE_TIMEOUT)
+						except Exception as e:
+							print("- x %s [Unable to extract disc data: %s]" % (sd, e))
+							finished, image_data = (True, None)
+						if finished:
+							entry['data'] = image_data
+							entry['image_stamp'] = image_stamp
+							scraped += 1
+						else:
+							# Keep serving the last known data, and try again once this scrape has given up
+							print("- x %s [Timed out after %gs]" % (sd, settings.IMAGE_TIMEOUT))
+							self.inflight[sd] = done
+							if previous:
+								entry['data'] = previous['data']
+				entries[sd] = entry
+
+			# Build the lookup tables, then swap them in
+			images = []
+			folders = {}
+			titles = {}
+			for sd in self.subdirs:
+				if sd in entries and entries[sd]['data']:
+					image_data = entries[sd]['data']
+					images.append(image_data)
+					number = folderNumber(sd)
+					if number is not None:
+						folders[number] = image_data
+					titles.setdefault(image_data['title'].lower(), []).append(image_data)
+
+			with self.lock:
+				self.entries = entries
+				self.images = images
+				self.folders = folders
+				self.titles = titles
+			return scraped
+
+	def list(self):
+		""" All of the images, in folder order """
+
+		with self.lock:
+			return list(self.images)
+
+	def lookupFolder(self, folder):
+		""" Find an image by folder name; 5, 05 and 005 all refer to the same folder """
+
+		number = folderNumber(folder)
+		if number is None and folder.isdigit():
+			number = int(folder)
+		with self.lock:
+			return self.folders.get(number)
+
+	def lookupTitle(self, title):
+		""" Find all images with a title (case insensitive) """
+
+		with self.lock:
+			return list(self.titles.get(title.rstrip().lower(), []))
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+	""" Answer JSON requests, one per line, until the client disconnects """
+
+	def handle(self):
+		for line in self.rfile:
+			try:
+				request = json.loads(line)
+				reply = self.server.dispatch(request)
+			except Exception as e:
+				if self.server.verbose:
+					traceback.print_exc()
+				reply = {'ok' : False, 'error' : str(e)}
+			self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+			self.wfile.flush()
+
+class MenuDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	""" Unix domain socket server around an ImageIndex """
+
+	daemon_threads = True
+
+	def __init__(self, data_dir, socket_path, verbose):
+		self.data_dir = data_dir
+		self.socket_path = socket_path
+		self.verbose = verbose
+		self.index = ImageIndex(data_dir, verbose)
+		self.build_lock = threading.Lock()
+		self.stopping = threading.Event()
+		removeStaleSocket(socket_path)
+		socketserver.UnixStreamServer.__init__(self, socket_path, DaemonHandler)
+
+	def dispatch(self, request):
+		cmd = request.get('cmd')
+		if cmd == "list":
+			return {'ok' : True, 'images' : self.index.list()}
+		elif cmd == "lookup":
+			if 'folder' in request:
+				image_data = self.index.lookupFolder(str(request['folder']))
+				if image_data is None:
+					return {'ok' : False, 'error' : "no image in folder %s" % request['folder']}
+				return {'ok' : True, 'images' : [image_data]}
+			elif 'title' in request:
+				return {'ok' : True, 'images' : self.index.lookupTitle(request['title'])}
+			return {'ok' : False, 'error' : "lookup needs a folder or title"}
+		elif cmd == "refresh":
+			return {'ok' : True, 'scraped' : self.index.refresh()}
+		elif cmd == "regenerate":
+			images = self.index.list()
+			with self.build_lock:
+				writeListIni(self.data_dir, images)
+			return {'ok' : True, 'images' : len(images)}
+		elif cmd == "iso":
+			menu = request.get('menu', 1)
+			if menu == "all":
+				menus = sorted(settings.MENU_BINS)
+			elif type(menu) is int and menu in settings.MENU_BINS:
+				menus = [menu]
+			else:
+				return {'ok' : False, 'error' : "unknown menu %s, use %s or \"all\"" % (json.dumps(menu), ", ".join([str(m) for m in sorted(settings.MENU_BINS)]))}
+			with self.build_lock:
+				built = buildIso(self.data_dir, menus, self.verbose)
+			if not built:
+				return {'ok' : False, 'error' : "iso build failed, see the daemon output"}
+			return {'ok' : True}
+		elif cmd == "shutdown":
+			self.stopping.set()
+			threading.Thread(target = self.shutdown).start()
+			return {'ok' : True}
+		return {'ok' : False, 'error' : "unknown command %s" % cmd}
+
+	def refresher(self):
+		""" Background thread, re-checks the filesystem metadata every DAEMON_REFRESH seconds """
+
+		while not self.stopping.wait(settings.DAEMON_REFRESH):
+			try:
+				scraped = self.index.refresh()
+				if scraped and self.verbose:
+					print("- %s image records refreshed" % scraped)
+			except Exception as e:
+				print("- x Refresh failed: %s" % e)
+
+	def server_close(self):
+		socketserver.UnixStreamServer.server_close(self)
+		if os.path.exists(self.socket_path):
+			os.unlink(self.socket_path)
+
+def runDaemon(data_dir, socket_path, verbose):
+	""" Scan the card once, then serve queries from memory until shut down """
+
+	print("")
+	print("Starting daemon...")
+	try:
+		server = MenuDaemon(data_dir, socket_path, verbose)
+	except OSError as e:
+		print("- ERROR, %s" % e)
+		sys.exit(2)
+	scraped = server.index.refresh()
+	print("- %s image data records extracted" % scraped)
+	print("- Listening on %s" % socket_path)
+
+	refresher = threading.Thread(target = server.refresher, daemon = True)
+	refresher.start()
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.stopping.set()
+	server.server_close()
+	print("- Stopped")
+
+def daemonQuery(socket_path, request):
+	""" Send a single request to a running daemon and return its reply """
+
+	s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	s.connect(socket_path)
+	f = s.makefile("rwb")
+	f.write((json.dumps(request) + "\n").encode('utf-8'))
+	f.flush()
+	reply = json.loads(f.readline())
+	f.close()
+	s.close()
+	return reply
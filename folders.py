@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import settings
+
+def folderNumber(name):
+	""" Return the image number of a folder named in the 01-99, 001-999 or 0001-9999 scheme, or None if it is not valid """
+
+	if len(name) in settings.DIR_WIDTHS and name.isascii() and name.isdigit():
+		number = int(name)
+		if number > 0:
+			return number
+	return None
+
+def folderName(number, width = None):
+	""" Return a valid folder name for an image number, at least width digits wide (the shortest possible by default) """
+
+	for w in settings.DIR_WIDTHS:
+		if (width is None or w >= width) and number < 10 ** w:
+			return "%0*d" % (w, number)
+	return None
+
+def folderWidths(names):
+	""" The widths of the validly named image folders, not counting the RMENU folder """
+
+	widths = set()
+	for name in names:
+		if name != settings.RMENU_DIR and folderNumber(name) is not None:
+			widths.add(len(name))
+	return sorted(widths)
+
+def folderSortKey(name):
+	""" Sort folders by image number rather than by name, with invalid names last """
+
+	number = folderNumber(name)
+	if number is None:
+		return (1, 0, name)
+	return (0, number, name)
+
+def folderCollisions(names):
+	""" Find folders that resolve to the same image number, e.g. 05 and 005 """
+
+	numbers = {}
+	for name in names:
+		number = folderNumber(name)
+		if number is not None:
+			numbers.setdefault(number, []).append(name)
+
+	collisions = []
+	for number in sorted(numbers):
+		if len(numbers[number]) > 1:
+			collisions.append(sorted(numbers[number]))
+	return collisions
+
+def freeFolderNames(names):
+	""" Generate the names of unused image numbers, lowest first, in the widest naming scheme already in use """
+
+	# New folders must match the existing ones, Rhea/Phoebe can't cope with a mix of 05 and 006
+	widths = folderWidths(names)
+	if len(widths):
+		width = widths[-1]
+	else:
+		width = None
+
+	used = set()
+	for name in names:
+		number = folderNumber(name)
+		if number is not None:
+			used.add(number)
+
+	for number in range(1, settings.DIR_MAX + 1):
+		if number not in used:
+			yield folderName(number, width)
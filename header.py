@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import settings
+
+# Fields of the SEGA Saturn system area header: (key, offset, size, description)
+HEADER_FIELDS = [
+	('title', settings.DISC_TITLE_OFFSET, settings.DISC_TITLE_SIZE, "Disc Title"),
+	('region', settings.DISC_REGION_OFFSET, settings.DISC_REGION_SIZE, "Disc Region"),
+	('version', settings.DISC_VERSION_OFFSET, settings.DISC_VERSION_SIZE, "Disc Version"),
+	('date', settings.DISC_DATE_OFFSET, settings.DISC_DATE_SIZE, "Disc Date"),
+	('number', settings.DISC_NUMBER_OFFSET, settings.DISC_NUMBER_SIZE, "Disc Number"),
+]
+
+def decodeHeader(header_bytes, verbose, fields = HEADER_FIELDS):
+	""" Extract the disc name, version, date etc from the bytes of a SEGA Saturn disc header, or None if it isn't one """
+
+	disc_data = {
+		'title' : "",
+		'region' : "",
+		'version' : "",
+		'number' : "",
+		'date' : "",
+	}
+
+	####################################
+	#
+	# Check for the valid disc string
+	#
+	####################################
+	if header_bytes[0:len(settings.DISC_STRING)] != settings.DISC_STRING.encode('ascii'):
+		if verbose:
+			print("--- x [Header] %s not found" % settings.DISC_STRING)
+		return None
+
+	if verbose > 1:
+		print("--- [HEADER] <%s>" % header_bytes.decode('ascii', 'ignore'))
+
+	####################################
+	#
+	# Extract each of the header fields
+	#
+	####################################
+	for field in fields:
+		text_bytes = header_bytes[field[1]:field[1] + field[2]]
+		# Some images have stray non-ascii bytes or nulls in the padding, drop them
+		s = text_bytes.decode('ascii', 'ignore').rstrip("\x00 ")
+		disc_data[field[0]] = s
+		if verbose:
+			print("--- ! [%s] %s" % (field[3], s))
+
+	return disc_data
+
+def dataScraperHeader(filename, offset, verbose):
+	""" Read and decode the disc header found at a known byte offset of an image file """
+
+	if verbose > 1:
+		print("--- Reading header @ 0x%X" % offset)
+
+	f = open(filename, "rb")
+	f.seek(offset, 0)
+	header_bytes = f.read(settings.DISC_HEADER_SIZE)
+	f.close()
+
+	return decodeHeader(header_bytes, verbose)
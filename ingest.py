@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import os
+import shutil
+import time
+
+import settings
+from cue import findFile, parseCue
+from folders import freeFolderNames
+from scan import findImage, matchImage, scrapeImage
+from menu import appendListIni
+
+def sourceFiles(src):
+	""" Find the image file and its companion files for a source to be ingested, returns (image, files, problem) """
+
+	src = src.rstrip("/")
+	if not os.path.exists(src):
+		return (None, [], "does not exist")
+	if os.path.isdir(src):
+		directory = src
+		i = findImage(os.path.dirname(src) or ".", os.path.basename(src))
+	else:
+		directory = os.path.dirname(src) or "."
+		i = matchImage(directory, None, os.path.basename(src))
+	if i is None:
+		return (None, [], "no valid image files found")
+
+	files = []
+	if i['is_cue']:
+		# The cue sheet and every track file it references
+		files.append(i['filename'])
+		tracks = parseCue(directory + "/" + i['filename'])
+		if len(tracks) == 0:
+			return (None, [], "no tracks in cue sheet")
+		for t in tracks:
+			if "/" in t['file'] or "\\" in t['file']:
+				# Only the files themselves are copied, so the cue sheet would no longer point at them
+				return (None, [], "track file %s is not next to the cue sheet" % t['file'])
+			track_file = findFile(directory, t['file'])
+			if track_file is None:
+				return (None, [], "missing track file %s" % t['file'])
+			if os.path.basename(track_file) not in files:
+				files.append(os.path.basename(track_file))
+
+	if os.path.isdir(src):
+		# Everything in the directory is copied
+		for f in sorted(os.listdir(directory)):
+			if os.path.isfile(directory + "/" + f) and f not in files:
+				files.append(f)
+	elif not i['is_cue']:
+		# Files sharing the same name, e.g. .img/.ccd/.sub or .mdf/.mds
+		stem = os.path.splitext(i['filename'])[0].lower()
+		for f in sorted(os.listdir(directory)):
+			if os.path.splitext(f)[0].lower() == stem and os.path.isfile(directory + "/" + f):
+				files.append(f)
+	if len(files) == 0:
+		return (None, [], "no files found")
+	return (i, files, None)
+
+def copyFile(src, dst):
+	""" Copy a file inside the kernel where possible, falling back to large buffered reads. Returns (bytes, method) """
+
+	fsrc = open(src, "rb")
+	fdst = open(dst, "wb")
+	size = os.fstat(fsrc.fileno()).st_size
+	copied = 0
+
+	# copy_file_range: no data passes through user space, and may be offloaded by the filesystem
+	method = "copy_file_range"
+	try:
+		while copied < size:
+			n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(size - copied, settings.INGEST_CHUNK), copied, copied)
+			if n == 0:
+				break
+			copied += n
+	except (AttributeError, OSError):
+		# Older kernel/Python, or not supported between these two filesystems
+		method = "sendfile"
+
+	if method == "sendfile":
+		try:
+			os.lseek(fdst.fileno(), copied, os.SEEK_SET)
+			while copied < size:
+				n = os.sendfile(fdst.fileno(), fsrc.fileno(), copied, min(size - copied, settings.INGEST_CHUNK))
+				if n == 0:
+					break
+				copied += n
+		except (AttributeError, OSError):
+			method = "read/write"
+
+	if method == "read/write":
+		fsrc.seek(copied)
+		fdst.seek(copied)
+		while True:
+			buf = fsrc.read(settings.INGEST_CHUNK)
+			if not buf:
+				break
+			fdst.write(buf)
+			copied += len(buf)
+
+	fdst.close()
+	fsrc.close()
+	if copied != size:
+		raise OSError("short copy of %s, %s of %s bytes" % (src, copied, size))
+	return (copied, method)
+
+def timedCopy(src, dst):
+	""" Copy a file, returning (bytes, method, seconds) """
+
+	start = time.perf_counter()
+	copied, method = copyFile(src, dst)
+	return (copied, method, time.perf_counter() - start)
+
+def megabytes(size, seconds):
+	""" Format a size and transfer rate as MB and MB/s """
+
+	mb = size / (1024 * 1024)
+	if seconds > 0:
+		return "%.1f MB @ %.1f MB/s" % (mb, mb / seconds)
+	return "%.1f MB" % mb
+
+def ingestImages(data_dir, sources, verbose):
+	""" Copy images on to the card in to the next free folders, scraping the disc data from the source as they copy """
+
+	####################################
+	#
+	# Find the files of each source and allocate a folder
+	#
+	####################################
+	print("")
+	print("Finding images to ingest...")
+	dirnumbers = freeFolderNames(os.listdir(data_dir))
+	jobs = []
+	for src in sources:
+		i, files, problem = sourceFiles(src)
+		if i is None:
+			print("- x %s [%s]" % (src, problem))
+			continue
+		sd = next(dirnumbers, None)
+		if sd is None:
+			print("- ERROR, no free directory numbers left for %s" % src)
+			break
+		i['subdir'] = sd
+		jobs.append({
+			'src' : src,
+			'image' : i,
+			'files' : files,
+			'subdir' : sd,
+		})
+		print("- %s <- %s (%s files)" % (sd, i['filename'], len(files)))
+
+	if len(jobs) == 0:
+		print("- ERROR, nothing to ingest")
+		return []
+
+	####################################
+	#
+	# Copy every file, with a bounded number of copies running at
+	# once. The disc data is scraped from the source alongside the
+	# copy, so nothing needs to be read back from the card.
+	#
+	####################################
+	print("")
+	print("Copying images...")
+	start = time.perf_counter()
+	total = 0
+	pool = concurrent.futures.ThreadPoolExecutor(max_workers = settings.INGEST_THREADS)
+	for job in jobs:
+		os.mkdir(data_dir + "/" + job['subdir'])
+		job['scrape'] = pool.submit(scrapeImage, job['image'], verbose)
+		job['copies'] = []
+		for f in job['files']:
+			copy = pool.submit(timedCopy, job['image']['dir'] + "/" + f, data_dir + "/" + job['subdir'] + "/" + f)
+			job['copies'].append((f, copy))
+
+	images = []
+	for job in jobs:
+		failed = False
+		for f, copy in job['copies']:
+			try:
+				copied, method, seconds = copy.result()
+				total += copied
+				print("- %s/%s %s [%s]" % (job['subdir'], f, megabytes(copied, seconds), method))
+			except Exception as e:
+				print("- x %s/%s [Copy failed: %s]" % (job['subdir'], f, e))
+				failed = True
+
+		if not failed:
+			try:
+				image_data = job['scrape'].result()
+				if image_data is None:
+					print("- x %s [No %s disc header found in %s]" % (job['subdir'], settings.DISC_STRING, job['image']['filename']))
+					failed = True
+			except Exception as e:
+				print("- x %s [Unable to extract disc data: %s]" % (job['subdir'], e))
+				failed = True
+
+		if failed:
+			# Never leave a half-copied or unreadable image on the card
+			shutil.rmtree(data_dir + "/" + job['subdir'], ignore_errors = True)
+			print("- x %s [Removed, not added to %s]" % (job['subdir'], settings.LIST_INI))
+			continue
+
+		images.append(image_data)
+	pool.shutdown()
+	print("- %s images, %s total" % (len(images), megabytes(total, time.perf_counter() - start)))
+
+	####################################
+	#
+	# Add the new images to the end of LIST.INI
+	#
+	####################################
+	if len(images):
+		print("")
+		print("Updating %s..." % settings.LIST_INI)
+		appendListIni(data_dir, images)
+		for i in images:
+			print("- %s.title=%s" % (i['subdir'], i['title']))
+		print("- OK")
+
+	return images
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+###########################################
+#
+# Quick truncation and integrity checks of image files.
+#
+# The expected size of each image is taken from its own layout
+# (CDI descriptor, CCD TOC, cue sheet or MDS track blocks), and
+# the ISO9660 volume descriptor of the data track. A few sectors at
+# the end of the data track are then read to confirm they have a
+# valid sync pattern and address. Only a handful of small reads
+# are needed per image, whatever its size.
+#
+###########################################
+
+import os
+import struct
+
+import settings
+from cdi import cdiDescriptor, parseCDI
+from ccd import parseCCD
+from cue import findFile, parseCue
+from mdf import parseMDS
+
+# ISO9660 primary volume descriptor, in sector 16 of the data track
+ISO_PVD_SECTOR = 16
+ISO_PVD_ID = b"\x01CD001"
+ISO_VOLUME_SIZE = struct.Struct("<I")
+ISO_VOLUME_SIZE_OFFSET = 80
+
+def sectorAddress(sector_header):
+	""" The disc address (LBA) from the BCD minute/second/frame header of a raw sector """
+
+	msf = []
+	for value in sector_header[12:15]:
+		msf.append(((value >> 4) * 10) + (value & 0x0F))
+	return (((msf[0] * 60) + msf[1]) * 75) + msf[2] - 150
+
+def checkDataTrack(filename, offset, sector_size, data_offset, track_sectors = None, lba = None):
+	""" Check a data track against its expected length, and sample the sync pattern of its last sectors """
+
+	problems = []
+	size = os.path.getsize(filename)
+
+	f = open(filename, "rb")
+
+	####################################
+	#
+	# The ISO9660 volume size gives the length of the data track
+	# when the layout itself doesn't
+	#
+	####################################
+	f.seek(offset + (ISO_PVD_SECTOR * sector_size) + data_offset, 0)
+	pvd_bytes = f.read(ISO_VOLUME_SIZE_OFFSET + ISO_VOLUME_SIZE.size)
+	if pvd_bytes[0:len(ISO_PVD_ID)] == ISO_PVD_ID:
+		volume_sectors = ISO_VOLUME_SIZE.unpack_from(pvd_bytes, ISO_VOLUME_SIZE_OFFSET)[0]
+		if track_sectors is None or volume_sectors < track_sectors:
+			track_sectors = volume_sectors
+	elif track_sectors is None:
+		f.close()
+		problems.append("no ISO9660 volume descriptor in data track")
+		return problems
+
+	expected = offset + (track_sectors * sector_size)
+	if size < expected:
+		f.close()
+		problems.append("truncated, data track needs %s bytes, file is %s" % (expected, size))
+		return problems
+
+	####################################
+	#
+	# Raw sectors carry a sync pattern and their own address
+	#
+	####################################
+	if sector_size >= 2352:
+		for sector in range(max(0, track_sectors - settings.INTEGRITY_SAMPLES), track_sectors):
+			f.seek(offset + (sector * sector_size), 0)
+			sector_header = f.read(len(settings.CD_SYNC) + 4)
+			if sector_header[0:len(settings.CD_SYNC)] != settings.CD_SYNC:
+				problems.append("no sync pattern in sector %s" % sector)
+				break
+			# Without the disc address of the track, the samples only need consecutive addresses
+			if lba is None:
+				lba = sectorAddress(sector_header) - sector
+			if sectorAddress(sector_header) != lba + sector or sector_header[15] not in [1, 2]:
+				problems.append("bad sector header in sector %s" % sector)
+				break
+
+	f.close()
+	return problems
+
+def checkCDI(i):
+	""" Check a DiscJuggler image against the track layout in the descriptor at its end, missing if the file is cut short """
+
+	filename = i['dir'] + "/" + i['filename']
+	size = os.path.getsize(filename)
+	if size < 8:
+		return ["truncated, file is %s bytes" % size]
+
+	version, header_offset = cdiDescriptor(filename)
+	if version is None:
+		return ["truncated, no CDI descriptor at end of file"]
+	if header_offset <= 0 or header_offset >= size:
+		return ["truncated, CDI descriptor offset %s outside of file" % header_offset]
+
+	tracks = parseCDI(filename)
+	if len(tracks) == 0:
+		# The trailer is intact, but the data track can't be found
+		return None
+
+	problems = []
+	expected = max([t['offset'] + (t['length'] * t['sector_size']) for t in tracks])
+	if header_offset < expected:
+		problems.append("truncated, CDI descriptor needs %s bytes of track data, file has %s" % (expected, header_offset))
+		return problems
+
+	for t in tracks:
+		if t['mode'] != "AUDIO":
+			problems += checkDataTrack(filename, t['offset'], t['sector_size'], t['data_offset'], t['length'] or None, t['start_sector'])
+			break
+	return problems
+
+def checkCCD(i):
+	""" Check a CloneCD .img against the lead-out of its .ccd TOC """
+
+	filename = i['dir'] + "/" + i['filename']
+	ccd_filename = findFile(i['dir'], os.path.splitext(i['filename'])[0] + ".ccd")
+	if ccd_filename is None:
+		return None
+
+	toc = parseCCD(ccd_filename)
+	leadout = None
+	tracks = []
+	for entry in toc:
+		if entry['point'] == 0xA2:
+			leadout = entry['plba']
+		elif entry['point'] < 0xA0:
+			tracks.append(entry)
+	tracks.sort(key = lambda t: t['plba'])
+	if leadout is None:
+		return ["no lead-out in %s" % os.path.basename(ccd_filename)]
+
+	problems = []
+	size = os.path.getsize(filename)
+	if size < leadout * 2352:
+		problems.append("truncated, TOC needs %s bytes, file is %s" % (leadout * 2352, size))
+		return problems
+
+	sub_filename = findFile(i['dir'], os.path.splitext(i['filename'])[0] + ".sub")
+	if sub_filename and os.path.getsize(sub_filename) < leadout * settings.MDS_SUBCHANNEL_SIZE:
+		problems.append("truncated, %s is short" % os.path.basename(sub_filename))
+
+	for n, t in enumerate(tracks):
+		# Control bit 2 is set for data tracks
+		if t['control'] & 0x04:
+			if n + 1 < len(tracks):
+				end = tracks[n + 1]['plba']
+			else:
+				end = leadout
+			problems += checkDataTrack(filename, t['plba'] * 2352, 2352, settings.CUE_MODES["MODE1/2352"][1], end - t['plba'], t['plba'])
+			break
+	return problems
+
+def checkCUE(i):
+	""" Check every file of a cue sheet is present and whole, and the data track against its volume size """
+
+	tracks = parseCue(i['dir'] + "/" + i['filename'])
+	problems = []
+	data_checked = False
+	for n, t in enumerate(tracks):
+		filename = findFile(i['dir'], t['file'])
+		if filename is None:
+			problems.append("missing track file %s" % t['file'])
+			continue
+		last_in_file = (n + 1 == len(tracks)) or (tracks[n + 1]['file'] != t['file'])
+		if last_in_file:
+			size = os.path.getsize(filename)
+			if size <= t['offset'] or (size - t['offset']) % t['sector_size']:
+				problems.append("truncated, %s is not a whole number of sectors" % t['file'])
+		if t['mode'] != "AUDIO" and not data_checked:
+			data_checked = True
+			if last_in_file:
+				track_sectors = None
+			else:
+				track_sectors = (tracks[n + 1]['offset'] - t['offset']) // t['sector_size']
+			problems += checkDataTrack(filename, t['offset'], t['sector_size'], t['data_offset'], track_sectors)
+	return problems
+
+def checkMDF(i):
+	""" Check an Alcohol 120% .mdf against the track blocks of its .mds """
+
+	filename = i['dir'] + "/" + i['filename']
+	mds_filename = findFile(i['dir'], os.path.splitext(i['filename'])[0] + ".mds")
+	if mds_filename is None:
+		return None
+
+	tracks = parseMDS(mds_filename)
+	if len(tracks) == 0:
+		return ["no tracks in %s" % os.path.basename(mds_filename)]
+
+	problems = []
+	size = os.path.getsize(filename)
+	expected = max([t['offset'] + (t['length'] * t['sector_size']) for t in tracks])
+	if size < expected:
+		problems.append("truncated, MDS needs %s bytes, file is %s" % (expected, size))
+		return problems
+
+	for t in tracks:
+		if t['mode'] != "AUDIO":
+			problems += checkDataTrack(filename, t['offset'], t['sector_size'], t['data_offset'], t['length'] or None, t['start_sector'])
+			break
+	return problems
+
+def checkISO(i):
+	""" Check a plain .iso against its own volume size """
+
+	filename = i['dir'] + "/" + i['filename']
+	f = open(filename, "rb")
+	sector_bytes = f.read(16)
+	f.close()
+
+	if sector_bytes[0:len(settings.CD_SYNC)] == settings.CD_SYNC:
+		sector_size = 2352
+		if sector_bytes[15] == 2:
+			data_offset = settings.CUE_MODES["MODE2/2352"][1]
+		else:
+			data_offset = settings.CUE_MODES["MODE1/2352"][1]
+	else:
+		sector_size = 2048
+		data_offset = 0
+
+	problems = []
+	if os.path.getsize(filename) % sector_size:
+		problems.append("truncated, not a whole number of %s byte sectors" % sector_size)
+	return problems + checkDataTrack(filename, 0, sector_size, data_offset)
+
+def checkImage(i):
+	""" Check an image file for truncation, returns (True/False, problems), or (None, problems) if it can't be checked """
+
+	try:
+		if i['is_cdi']:
+			problems = checkCDI(i)
+		elif i['is_ccd']:
+			problems = checkCCD(i)
+		elif i['is_mdf']:
+			problems = checkMDF(i)
+		elif i['is_cue']:
+			problems = checkCUE(i)
+		elif i['is_iso']:
+			problems = checkISO(i)
+		else:
+			problems = None
+	except Exception as e:
+		return (False, ["unable to check: %s" % e])
+
+	if problems is None:
+		return (None, ["no layout information"])
+	return (len(problems) == 0, problems)
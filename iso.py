@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import settings
+from header import decodeHeader
+
+def dataScraperISO(image_data, verbose):
+	""" Extract disc data from a plain .iso image, either 2048 byte cooked or 2352 byte raw sectors """
+
+	f = open(image_data['dir'] + '/' +  image_data['filename'], "rb")
+
+	####################################
+	#
+	# A single read of the first sector covers the header
+	# for both cooked and raw layouts
+	#
+	####################################
+	sector_bytes = f.read(settings.CUE_MODES["MODE2/2352"][1] + settings.DISC_HEADER_SIZE)
+	f.close()
+
+	if sector_bytes[0:len(settings.CD_SYNC)] == settings.CD_SYNC:
+		# Raw sector, byte 15 of the sector header holds the mode
+		if sector_bytes[15] == 2:
+			mode = "MODE2/2352"
+		else:
+			mode = "MODE1/2352"
+	else:
+		mode = "MODE1/2048"
+	offset = settings.CUE_MODES[mode][1]
+
+	if verbose:
+		print("--- ! [ISO %s] header @ %s" % (mode, offset))
+
+	return decodeHeader(sector_bytes[offset:offset + settings.DISC_HEADER_SIZE], verbose)
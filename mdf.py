@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import os
+import struct
+
+import settings
+from cue import findFile
+from header import dataScraperHeader
+
+# Binary layout of the .MDS descriptor (all little endian)
+# Header: signature, version, medium type, number of sessions ... offset of the session blocks @ 0x50
+MDS_HEADER = struct.Struct("<16s2sHH")
+MDS_SESSIONS_OFFSET = struct.Struct("<I")
+MDS_SESSIONS_OFFSET_POS = 0x50
+# Session block: start, end, number, total blocks, non-track blocks, first track, last track, unused, offset of track blocks
+MDS_SESSION = struct.Struct("<iiHBBHHII")
+# Track block: mode, subchannel, adr/ctl, tno, point, msf, zero, pmsf, offset of extra block, sector size,
+# unused, start sector, start offset in the .MDF, number of files, offset of footer, unused
+MDS_TRACK = struct.Struct("<BBBBBBBBBBBBIH18sIQII24s")
+# Track extra block: pregap and length (in sectors)
+MDS_TRACK_EXTRA = struct.Struct("<II")
+
+def parseMDS(mds_filename):
+	""" Parse the track blocks of the first session of an Alcohol 120% .MDS descriptor """
+
+	f = open(mds_filename, "rb")
+	mds_bytes = f.read()
+	f.close()
+
+	header = MDS_HEADER.unpack_from(mds_bytes, 0)
+	if header[0] != settings.MDS_SIGNATURE.encode('ascii'):
+		return []
+
+	sessions_offset = MDS_SESSIONS_OFFSET.unpack_from(mds_bytes, MDS_SESSIONS_OFFSET_POS)[0]
+	session = MDS_SESSION.unpack_from(mds_bytes, sessions_offset)
+
+	tracks = []
+	for block in range(0, session[3]):
+		track_block = MDS_TRACK.unpack_from(mds_bytes, session[8] + (block * MDS_TRACK.size))
+		point = track_block[4]
+		if point == 0 or point >= 0xA0:
+			# Lead-in/lead-out entries, not a real track
+			continue
+
+		if track_block[12]:
+			pregap, length = MDS_TRACK_EXTRA.unpack_from(mds_bytes, track_block[12])
+		else:
+			pregap, length = (0, 0)
+
+		# Subchannel data is stored after the main sector data
+		if track_block[1]:
+			subchannel_size = settings.MDS_SUBCHANNEL_SIZE
+		else:
+			subchannel_size = 0
+		sector_size = track_block[13]
+		main_size = sector_size - subchannel_size
+
+		mode = settings.MDS_MODES.get(track_block[0] & 0x0F, "AUDIO")
+		if mode == "AUDIO" or main_size == 2048:
+			data_offset = 0
+		else:
+			data_offset = settings.CUE_MODES.get("%s/%s" % (mode, main_size), (main_size, 0))[1]
+
+		# The first track never has its pregap stored in the image
+		if point == 1:
+			file_pregap = 0
+		else:
+			file_pregap = pregap
+
+		tracks.append({
+			'number' : point,
+			'mode' : mode,
+			'sector_size' : sector_size,
+			'subchannel_size' : subchannel_size,
+			'data_offset' : data_offset,
+			'start_sector' : track_block[15],
+			'pregap' : file_pregap,
+			'length' : length,
+			'offset' : track_block[16] + (file_pregap * sector_size),
+		})
+
+	return tracks
+
+def dataScraperMDF(image_data, verbose):
+	""" Extract disc data from an Alcohol 120% .MDF image, as described by its .MDS file """
+
+	mds_filename = findFile(image_data['dir'], os.path.splitext(image_data['filename'])[0] + ".mds")
+	if mds_filename is None:
+		print("--- x [MDF] Unable to find .mds descriptor for %s" % image_data['filename'])
+		return None
+
+	tracks = parseMDS(mds_filename)
+
+	####################################
+	#
+	# Find the first data track
+	#
+	####################################
+	data_track = None
+	for t in tracks:
+		if t['mode'] != "AUDIO":
+			data_track = t
+			break
+
+	if data_track is None:
+		print("--- x [MDF] No data track found in %s" % mds_filename.split('/')[-1])
+		return None
+
+	offset = data_track['offset'] + data_track['data_offset']
+	if verbose:
+		print("--- ! [MDF track %s %s/%s] %s @ %s" % (data_track['number'], data_track['mode'], data_track['sector_size'], image_data['filename'], offset))
+
+	return dataScraperHeader(image_data['dir'] + '/' + image_data['filename'], offset, verbose)
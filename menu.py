@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import settings
+
+def listIniLines(images):
+	""" Generate the lines of the LIST.INI file, the RMENU entry first and then each image """
+
+	lines = [
+		"%s.title=RMENU" % settings.RMENU_DIR,
+		"%s.disc=1/1" % settings.RMENU_DIR,
+		"%s.region=JTUE" % settings.RMENU_DIR,
+		"%s.version=v999" % settings.RMENU_DIR,
+		"%s.date=99999999" % settings.RMENU_DIR,
+	]
+	for i in images:
+		lines += listIniEntry(i)
+	return lines
+
+def listIniEntry(i):
+	""" Generate the LIST.INI lines of a single image """
+
+	return [
+		"%s.title=%s" % (i['subdir'], i['title']),
+		"%s.disc=%s" % (i['subdir'], i['number']),
+		"%s.region=%s" % (i['subdir'], i['region']),
+		"%s.version=%s" % (i['subdir'], i['version']),
+		"%s.date=%s" % (i['subdir'], i['date']),
+	]
+
+def readListIni(data_dir):
+	""" Read the image entries of an existing LIST.INI file, returns a dict of subdir -> image data """
+
+	images = {}
+	list_ini = data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.LIST_INI
+	if not os.path.isfile(list_ini):
+		return images
+
+	f = open(list_ini, "r", encoding = "ascii", errors = "replace")
+	for line in f:
+		line = line.rstrip("\r\n")
+		if "=" not in line or "." not in line.split("=", 1)[0]:
+			continue
+		key, value = line.split("=", 1)
+		subdir, field = key.split(".", 1)
+		if subdir == settings.RMENU_DIR:
+			continue
+		# LIST.INI calls the disc number 'disc'
+		if field == "disc":
+			field = "number"
+		if field in ['title', 'number', 'region', 'version', 'date']:
+			images.setdefault(subdir, {
+				'title' : "",
+				'region' : "",
+				'version' : "",
+				'number' : "",
+				'date' : "",
+				'subdir' : subdir,
+			})[field] = value
+	f.close()
+	return images
+
+def writeListIni(data_dir, images):
+	""" Write out the LIST.INI file for a list of images in a single write """
+
+	lines = listIniLines(images)
+	f = open(data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.LIST_INI, "w", newline = "")
+	f.write("\r\n".join(lines) + "\r\n")
+	f.close()
+
+def appendListIni(data_dir, images):
+	""" Add entries for new images to the end of an existing LIST.INI file, or create it """
+
+	list_ini = data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/" + settings.LIST_INI
+	if not os.path.isfile(list_ini):
+		writeListIni(data_dir, images)
+		return
+
+	lines = []
+	for i in images:
+		lines += listIniEntry(i)
+
+	f = open(list_ini, "rb+")
+	f.seek(0, 2)
+	if f.tell() > 0:
+		# Make sure the new entries start on a line of their own
+		f.seek(-1, 2)
+		if f.read(1) != b"\n":
+			f.write(b"\r\n")
+	f.write(("\r\n".join(lines) + "\r\n").encode('ascii', 'replace'))
+	f.close()
+
+def buildIso(data_dir, menus, verbose = False):
+	""" Generate the .iso for one or more menu types, each from its own staging directory, all at the same time """
+
+	# mkisofs runs in the staging directory, so every path given to it must be absolute
+	data_dir = os.path.abspath(data_dir)
+	rmenu_dir = data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU/"
+
+	# A single menu is always built as RMENU.iso, so it can be loaded straight away
+	if len(menus) == 1:
+		outputs = {menus[0] : settings.MENU_ISOS[1]}
+	else:
+		outputs = {}
+		for menu in menus:
+			outputs[menu] = settings.MENU_ISOS[menu]
+
+	####################################
+	#
+	# Read the files shared by every menu once; that is everything
+	# in BIN/RMENU (themes, backgrounds etc. included) apart from
+	# the menu binaries themselves
+	#
+	####################################
+	print("")
+	print("Staging menu files...")
+	menu_bins = [b.upper() for b in list(settings.MENU_BINS.values()) + ["0.BIN"]]
+	shared = {}
+	for root, dirs, files in os.walk(rmenu_dir):
+		dirs.sort()
+		for filename in sorted(files):
+			path = os.path.relpath(root + "/" + filename, rmenu_dir)
+			if path.upper() in menu_bins:
+				continue
+			f = open(root + "/" + filename, "rb")
+			shared[path] = f.read()
+			f.close()
+
+	for menu in menus:
+		if menu not in settings.MENU_BINS:
+			print("- ERROR, invalid valid for menu file")
+			return False
+		if not os.path.isfile(rmenu_dir + settings.MENU_BINS[menu]):
+			print("- ERROR, unable to find %s" % (rmenu_dir + settings.MENU_BINS[menu]))
+			return False
+
+	staging = {}
+	for menu in menus:
+		# The menu binary is staged as 0.BIN, the copy on the card is never touched
+		src = rmenu_dir + settings.MENU_BINS[menu]
+		staging[menu] = tempfile.mkdtemp(prefix = "PyRMenuGen-")
+		for filename in shared:
+			os.makedirs(os.path.dirname(staging[menu] + "/" + filename), exist_ok = True)
+			f = open(staging[menu] + "/" + filename, "wb")
+			f.write(shared[filename])
+			f.close()
+		shutil.copyfile(src, staging[menu] + "/0.BIN")
+		print("- %s: using %s" % (outputs[menu], src))
+
+	####################################
+	#
+	# Run mkisofs for every menu at once
+	#
+	####################################
+	def mkisofs(menu):
+		cmd = [settings.MKISOFS,
+			"-sysid", "SEGA SATURN",
+			"-V", "RMENU",
+			"-volset", "RMENU",
+			"-publisher", "SEGA ENTERPRISES, LTD.",
+			"-p", "SEGA ENTREPRISES, LTD.",
+			"-A", "RMENU",
+			"-abstract", "ABS.TXT",
+			"-copyright", "CPY.TXT",
+			"-biblio", "BIB.TXT",
+			"-G", "IP.BIN",
+			"-full-iso9660-filenames",
+			"-input-charset", "iso8859-1",
+			"-o", data_dir + "/" + settings.RMENU_DIR + "/" + outputs[menu],
+			staging[menu]]
+		start = time.perf_counter()
+		result = subprocess.run(cmd, cwd = staging[menu], stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+		return (cmd, result, time.perf_counter() - start)
+
+	print("")
+	print("Going to run %s..." % settings.MKISOFS)
+	built = True
+	pool = concurrent.futures.ThreadPoolExecutor(max_workers = len(menus))
+	try:
+		builds = {}
+		for menu in menus:
+			builds[menu] = pool.submit(mkisofs, menu)
+		for menu in menus:
+			cmd, result, seconds = builds[menu].result()
+			iso = data_dir + "/" + settings.RMENU_DIR + "/" + outputs[menu]
+			if verbose:
+				print("- Running [%s]" % " ".join(cmd))
+				print(result.stdout.decode('utf-8', 'replace'))
+			if result.returncode == 0 and os.path.isfile(iso) and os.path.getsize(iso) > 0:
+				print("- %s built in %.2fs" % (outputs[menu], seconds))
+			else:
+				print("- ERROR, %s failed after %.2fs" % (outputs[menu], seconds))
+				if not verbose:
+					print(result.stdout.decode('utf-8', 'replace'))
+				built = False
+	finally:
+		pool.shutdown()
+		for menu in staging:
+			shutil.rmtree(staging[menu], ignore_errors = True)
+
+	return built
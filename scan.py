@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import threading
+
+import settings
+from cdi import dataScraperCDI
+from ccd import dataScraperCCD
+from cue import dataScraperCUE
+from iso import dataScraperISO
+from mdf import dataScraperMDF
+from folders import folderSortKey
+
+def findSubdirs(data_dir):
+	""" Find the first level image subdirectories of the data dir, in image number order """
+
+	data_sub_dirs = []
+	for sd in os.listdir(data_dir):
+		sd_name = sd
+		# Strip just the directory name off the /really/long/path/where/it/is
+		if '/' in sd_name:
+			sd_name = sd_name.split('/')[-1]
+		if sd_name in [settings.RMENU_DIR, '', "..", ".", "/"]:
+			# Don't record the RMENU directory itself
+			pass
+		elif os.path.isdir(data_dir + "/" + sd_name):
+			data_sub_dirs.append(sd_name)
+	data_sub_dirs.sort(key = folderSortKey)
+	return data_sub_dirs
+
+def matchImage(directory, sd, f):
+	""" Match a filename against the known (and supported) image types, returns the image file record or None """
+
+	i = {
+		'dir' : directory,
+		'subdir' : sd,
+		'filename' : f,
+		'is_cdi' : False,
+		'is_ccd' : False,
+		'is_mdf' : False,
+		'is_cue' : False,
+		'is_iso' : False,
+	}
+	found = False
+
+	file_match = re.search(r"\.cdi$", f, re.IGNORECASE)
+	if file_match:
+		i['is_cdi'] = True
+		found = True
+	file_match = re.search(r"\.img$", f, re.IGNORECASE)
+	if file_match:
+		i['is_ccd'] = True
+		found = True
+	file_match = re.search(r"\.mdf$", f, re.IGNORECASE)
+	if file_match:
+		i['is_mdf'] = True
+		found = True
+	file_match = re.search(r"\.cue$", f, re.IGNORECASE)
+	if file_match:
+		i['is_cue'] = True
+		found = True
+	file_match = re.search(r"\.iso$", f, re.IGNORECASE)
+	if file_match and not i['is_cue']:
+		i['is_iso'] = True
+		found = True
+
+	if found:
+		return i
+	return None
+
+def findImage(data_dir, sd):
+	""" Find the (first) supported image file in an image subdirectory, or None """
+
+	full_sd_path = data_dir + "/" + sd
+
+	# List all the files in this subdir, a cue sheet always
+	# takes priority over the .bin/.iso files it references
+	files = os.listdir(full_sd_path)
+	files.sort(key = lambda f: not f.lower().endswith(".cue"))
+	for f in files:
+		i = matchImage(full_sd_path, sd, f)
+		if i:
+			# If we found one matching image file, stop looking in this subdir
+			# we dont want to risk processing more images in the same folder
+			return i
+
+	return None
+
+def scrapeImage(i, verbose):
+	""" Attempt to determine the name of the game, version, date etc. of an image file """
+
+	image_data = None
+	if i['is_cdi']:
+		image_data = dataScraperCDI(i, verbose)
+	elif i['is_ccd']:
+		image_data = dataScraperCCD(i, verbose)
+	elif i['is_mdf']:
+		image_data = dataScraperMDF(i, verbose)
+	elif i['is_cue']:
+		image_data = dataScraperCUE(i, verbose)
+	elif i['is_iso']:
+		image_data = dataScraperISO(i, verbose)
+	else:
+		pass
+	if image_data:
+		image_data['subdir'] = i['subdir']
+	return image_data
+
+def runWithDeadline(function, args, timeout):
+	""" Run a function off the main thread, returns (True, result), or (False, None) if it misses the deadline """
+
+	if not timeout:
+		return (True, function(*args))
+
+	result = {}
+	def worker():
+		try:
+			result['value'] = function(*args)
+		except Exception as e:
+			result['error'] = e
+
+	# A read stuck on a failing sector can't be interrupted, so the thread is
+	# abandoned rather than joined; as a daemon thread it won't hold up exit
+	t = threading.Thread(target = worker, daemon = True)
+	t.start()
+	t.join(timeout)
+	if t.is_alive():
+		return (False, None)
+	if 'error' in result:
+		raise result['error']
+	return (True, result.get('value'))
+
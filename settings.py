@@ -20,23 +20,79 @@ CDI_BASES = [(0, 352816), (1, 339976), (2, 367216), (3, 307200), (4, 339968)]
 # Type 2 is what the Shining Force III patch utility generates 
 CCD_BASES = [(0, 16), (1,112), (2,0)]
 
-# ... and in Alchohol 120% .MDF files
-MDF_BASES = []
+# ... and in Alchohol 120% .MDF files the offset is read from the track blocks of the .MDS descriptor
+MDS_SIGNATURE = "MEDIA DESCRIPTOR"
+# Track modes (lower 4 bits of the track block mode byte)
+MDS_MODES = {0x09 : "AUDIO", 0x0A : "MODE1", 0x0B : "MODE2", 0x0C : "MODE2", 0x0D : "MODE2"}
+# Size of the subchannel data appended to each sector when it is present (2448 = 2352 + 96)
+MDS_SUBCHANNEL_SIZE = 96
+
+# ... and in cue sheet (.cue) and .iso images the offset is calculated from the track layout.
+# Track modes as found in a cue sheet: (bytes per sector, offset of the user data within each sector)
+CUE_MODES = {
+	"AUDIO" : (2352, 0),
+	"MODE1/2048" : (2048, 0),
+	"MODE1/2352" : (2352, 16),
+	"MODE2/2336" : (2336, 8),
+	"MODE2/2352" : (2352, 24),
+}
+
+# Every raw (2352 byte) data sector starts with this sync pattern
+CD_SYNC = b"\x00\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\x00"
 
 # Valid discs should have this string
 DISC_STRING = "SEGA SEGASATURN"
+DISC_HEADER_SIZE = 256
 DISC_TITLE_SIZE = 32
 DISC_REGION_SIZE = 10
 DISC_VERSION_SIZE = 6
 DISC_NUMBER_SIZE = 3
 DISC_DATE_SIZE = 8
 
+# Position of each field within the disc header (relative to the start of DISC_STRING)
+DISC_TITLE_OFFSET = 96
+DISC_REGION_OFFSET = 64
+DISC_VERSION_OFFSET = 42
+DISC_NUMBER_OFFSET = 59
+DISC_DATE_OFFSET = 48
+
+# Image folders are numbered 01-99, 001-999 or 0001-9999
+DIR_WIDTHS = [2, 3, 4]
+DIR_MAX = 9999
+
 # List of files that should be in the RMENU folder under ./01/BIN/RMENU
+# (0.BIN is staged from RMENU_BIN or RMENUKAI_BIN when the .iso is built)
 RMENU_DIR = "01"
 RMENU_BIN = "RMENU.BIN"
 RMENUKAI_BIN = "RMENUKAI.BIN"
-RMENU_FILES = ["0.BIN", "ABS.TXT", "BIB.TXT", "CPY.TXT", "IP.BIN", "Z.BIN"]
+RMENU_FILES = ["ABS.TXT", "BIB.TXT", "CPY.TXT", "IP.BIN", "Z.BIN"]
 LIST_INI = "LIST.INI"
 
+# The menu binary for each menu type, and the .iso generated for it when building them all
+MENU_BINS = {1 : RMENU_BIN, 2 : RMENUKAI_BIN}
+MENU_ISOS = {1 : "RMENU.iso", 2 : "RMENUKAI.iso"}
+
 # Name of the mkisofs executable with which to create the RMENU ISO
 MKISOFS = "mkisofs"
+
+# Daemon mode: default Unix domain socket, and how often (in seconds) to check the card for changes
+DAEMON_SOCKET = "/tmp/PyRMenuGen.sock"
+DAEMON_REFRESH = 2
+
+# Ingest mode: number of files copied at once, and the size of each copy request (bytes)
+INGEST_THREADS = 4
+INGEST_CHUNK = 64 * 1024 * 1024
+
+# Integrity check: compare image sizes against their track layout, and check the sync
+# pattern of this many sectors at the end of the data track, on every scan
+INTEGRITY_CHECK = True
+INTEGRITY_SAMPLES = 4
+# DiscJuggler .CDI files end with a descriptor version and header offset
+CDI_VERSIONS = [0x80000004, 0x80000005, 0x80000006]
+# Track modes and sector sizes, as stored in the .CDI descriptor
+CDI_MODES = {1 : "MODE1", 2 : "MODE2"}
+CDI_SECTOR_SIZES = {0 : 2048, 1 : 2336, 2 : 2352, 4 : 2448}
+
+# Seconds allowed for reading each image before it is abandoned (a failing card can
+# block a single read for a very long time), 0 to wait forever
+IMAGE_TIMEOUT = 10
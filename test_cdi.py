@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import struct
+import tempfile
+
+import pytest
+
+import settings
+from cdi import parseCDI, dataScraperCDI, CDI_TRACK_START
+from integrity import checkImage
+from scan import matchImage
+
+V2, V3, V35 = settings.CDI_VERSIONS
+DATA_SECTORS = 40
+AUDIO_SECTORS = 10
+PREGAP = 150
+
+def bcd(value):
+	return ((value // 10) << 4) | (value % 10)
+
+def dataTrack():
+	""" A raw mode 1 data track starting at LBA 0, a Saturn header in sector 0 and a volume descriptor in 16 """
+
+	track = b""
+	for sector in range(0, DATA_SECTORS):
+		data = bytearray(2048)
+		if sector == 0:
+			data[0:16] = b"SEGA SEGASATURN "
+			data[settings.DISC_TITLE_OFFSET:settings.DISC_TITLE_OFFSET + 8] = b"CDI TEST"
+		elif sector == 16:
+			data[0:6] = b"\x01CD001"
+			struct.pack_into("<I", data, 80, DATA_SECTORS)
+		frame = sector + 150
+		track += settings.CD_SYNC + bytes([bcd(frame // 4500), bcd((frame // 75) % 60), bcd(frame % 75), 1])
+		track += bytes(data) + bytes(288)
+	return track
+
+def trackBlock(version, pregap, length, mode, lba, extra):
+	""" A descriptor track block, optionally with each of the extra fields of later DiscJuggler versions """
+
+	if extra:
+		block = struct.pack("<I", 1) + bytes(8)
+	else:
+		block = struct.pack("<I", 0)
+	block += CDI_TRACK_START * 2 + bytes(4)
+	block += bytes([8]) + b"game.cdi" + bytes(19)
+	if extra:
+		block += struct.pack("<I", 0x80000000) + bytes(8)
+	else:
+		block += bytes(4)
+	block += bytes(2) + struct.pack("<II", pregap, length) + bytes(6)
+	block += struct.pack("<I", mode) + bytes(12)
+	block += struct.pack("<II", lba, pregap + length) + bytes(16)
+	# Sector size 2 is 2352 bytes
+	block += struct.pack("<I", 2) + bytes(29)
+	if version != V2:
+		block += bytes(5)
+		if extra:
+			block += struct.pack("<I", 0xFFFFFFFF) + bytes(78)
+		else:
+			block += bytes(4)
+	return block
+
+def cdiImage(version, extra = False):
+	""" A one session image: the data track and an audio track, each with its pregap, then the descriptor """
+
+	data = bytes(2352 * PREGAP) + dataTrack() + (b"\x01" * 2352 * (PREGAP + AUDIO_SECTORS))
+	descriptor = struct.pack("<HH", 1, 2)
+	descriptor += trackBlock(version, PREGAP, DATA_SECTORS, 1, 0, extra)
+	descriptor += trackBlock(version, PREGAP, AUDIO_SECTORS, 0, DATA_SECTORS + PREGAP, extra)
+	descriptor += bytes(12)
+	if version != V2:
+		descriptor += bytes(1)
+	if version == V35:
+		header_offset = len(descriptor) + 8
+	else:
+		header_offset = len(data)
+	return data + descriptor + struct.pack("<II", version, header_offset)
+
+@pytest.fixture
+def image_dir():
+	directory = tempfile.mkdtemp(prefix = "rmenu-")
+	yield directory
+	shutil.rmtree(directory, ignore_errors = True)
+
+def writeImage(directory, image_bytes):
+	f = open(directory + "/game.cdi", "wb")
+	f.write(image_bytes)
+	f.close()
+	return matchImage(directory, "02", "game.cdi")
+
+@pytest.mark.parametrize("version", [V2, V3, V35])
+@pytest.mark.parametrize("extra", [False, True])
+def test_track_layout(image_dir, version, extra):
+	writeImage(image_dir, cdiImage(version, extra))
+	tracks = parseCDI(image_dir + "/game.cdi")
+	assert len(tracks) == 2
+	assert tracks[0]['mode'] == "MODE1"
+	assert tracks[0]['sector_size'] == 2352
+	assert tracks[0]['data_offset'] == 16
+	assert tracks[0]['offset'] == PREGAP * 2352
+	assert tracks[0]['length'] == DATA_SECTORS
+	assert tracks[0]['start_sector'] == 0
+	# Each track is stored with its pregap, straight after the previous one
+	assert tracks[1]['mode'] == "AUDIO"
+	assert tracks[1]['offset'] == ((PREGAP * 2) + DATA_SECTORS) * 2352
+	assert tracks[1]['length'] == AUDIO_SECTORS
+
+def test_header_at_type_0_base(image_dir):
+	i = writeImage(image_dir, cdiImage(V35))
+	assert settings.CDI_BASES[0][1] == (PREGAP * 2352) + 16
+	assert dataScraperCDI(i, False)['title'] == "CDI TEST"
+
+def test_check_whole(image_dir):
+	i = writeImage(image_dir, cdiImage(V3))
+	assert checkImage(i) == (True, [])
+
+def test_check_truncated(image_dir):
+	image_bytes = cdiImage(V35)
+	i = writeImage(image_dir, image_bytes[:-(2352 * 100)])
+	ok, problems = checkImage(i)
+	assert ok is False
+	assert problems == ["truncated, no CDI descriptor at end of file"]
+
+def test_check_short_track_data(image_dir):
+	# Sectors lost from before the descriptor, with the trailer still pointing at it
+	image_bytes = cdiImage(V2)
+	header_offset = struct.unpack("<I", image_bytes[-4:])[0] - (2352 * 100)
+	i = writeImage(image_dir, image_bytes[2352 * 100:-4] + struct.pack("<I", header_offset))
+	ok, problems = checkImage(i)
+	assert ok is False
+	assert problems[0].startswith("truncated, CDI descriptor needs")
+
+def test_check_zeroed_data_track(image_dir):
+	image_bytes = bytearray(cdiImage(V3))
+	end = (PREGAP + DATA_SECTORS) * 2352
+	image_bytes[end - 2352:end] = bytes(2352)
+	ok, problems = checkImage(writeImage(image_dir, bytes(image_bytes)))
+	assert ok is False
+	assert problems == ["no sync pattern in sector %s" % (DATA_SECTORS - 1)]
+
+def test_unreadable_descriptor(image_dir):
+	image_bytes = bytearray(cdiImage(V3))
+	image_bytes[(PREGAP * 2 + DATA_SECTORS + AUDIO_SECTORS) * 2352 + 10] = 0x55
+	ok, problems = checkImage(writeImage(image_dir, bytes(image_bytes)))
+	assert ok is None
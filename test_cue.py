@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from cue import parseCue
+
+def cueTracks(cue_text):
+	""" Parse a cue sheet written to a temporary file """
+
+	f = tempfile.NamedTemporaryFile("w", suffix = ".cue", delete = False)
+	f.write(cue_text)
+	f.close()
+	try:
+		return parseCue(f.name)
+	finally:
+		os.unlink(f.name)
+
+def test_first_track_not_at_file_start():
+	tracks = cueTracks('FILE "game.bin" BINARY\n  TRACK 01 MODE1/2352\n    INDEX 01 00:02:00\n')
+	assert tracks[0]['offset'] == 150 * 2352
+
+def test_pregap_index_00_and_01():
+	tracks = cueTracks(
+		'FILE "game.bin" BINARY\n'
+		'  TRACK 01 MODE1/2048\n'
+		'    INDEX 01 00:00:00\n'
+		'  TRACK 02 AUDIO\n'
+		'    INDEX 00 00:00:10\n'
+		'    INDEX 01 00:02:10\n'
+		'FILE "track3.bin" BINARY\n'
+		'  TRACK 03 AUDIO\n'
+		'    INDEX 00 00:00:00\n'
+		'    INDEX 01 00:02:00\n')
+	assert tracks[0]['offset'] == 0
+	# 10 sectors of 2048 byte data, then a 150 sector pregap of audio
+	assert tracks[1]['offset'] == (10 * 2048) + (150 * 2352)
+	assert tracks[2]['offset'] == 150 * 2352
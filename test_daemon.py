@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import pytest
+
+import settings
+from daemon import MenuDaemon, daemonQuery
+
+def writeImage(directory, title):
+	""" Write a minimal cooked .iso with a SEGA Saturn header in its first sector """
+
+	header = bytearray(b" " * settings.DISC_HEADER_SIZE)
+	header[0:16] = b"SEGA SEGASATURN "
+	header[settings.DISC_VERSION_OFFSET:settings.DISC_VERSION_OFFSET + 6] = b"V1.001"
+	header[settings.DISC_DATE_OFFSET:settings.DISC_DATE_OFFSET + 8] = b"19951122"
+	header[settings.DISC_NUMBER_OFFSET:settings.DISC_NUMBER_OFFSET + 3] = b"1/1"
+	header[settings.DISC_REGION_OFFSET:settings.DISC_REGION_OFFSET + 4] = b"JTUE"
+	header[settings.DISC_TITLE_OFFSET:settings.DISC_TITLE_OFFSET + len(title)] = title.encode('ascii')
+	os.makedirs(directory)
+	f = open(directory + "/game.iso", "wb")
+	f.write(bytes(header).ljust(2048 * 20, b"\x00"))
+	f.close()
+
+@pytest.fixture
+def card():
+	# Kept short, Unix socket paths are limited to ~100 bytes
+	data_dir = tempfile.mkdtemp(prefix = "rmenu-")
+	os.makedirs(data_dir + "/" + settings.RMENU_DIR + "/BIN/RMENU")
+	writeImage(data_dir + "/002", "FIRST GAME")
+	writeImage(data_dir + "/003", "SECOND GAME")
+	yield data_dir
+	shutil.rmtree(data_dir, ignore_errors = True)
+
+@pytest.fixture
+def server(card):
+	socket_path = card + "/daemon.sock"
+	server = MenuDaemon(card, socket_path, False)
+	server.index.refresh()
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+def test_list_and_lookup(server):
+	reply = daemonQuery(server.socket_path, {'cmd' : "list"})
+	assert reply['ok']
+	assert [i['title'] for i in reply['images']] == ["FIRST GAME", "SECOND GAME"]
+
+	reply = daemonQuery(server.socket_path, {'cmd' : "lookup", 'folder' : "3"})
+	assert reply['images'][0]['subdir'] == "003"
+	reply = daemonQuery(server.socket_path, {'cmd' : "lookup", 'title' : "first game"})
+	assert reply['images'][0]['subdir'] == "002"
+	reply = daemonQuery(server.socket_path, {'cmd' : "lookup", 'folder' : "9"})
+	assert not reply['ok'] and 'error' in reply
+
+def test_refresh_picks_up_new_image(server):
+	assert daemonQuery(server.socket_path, {'cmd' : "refresh"})['scraped'] == 0
+	writeImage(server.data_dir + "/004", "THIRD GAME")
+	assert daemonQuery(server.socket_path, {'cmd' : "refresh"})['scraped'] == 1
+	reply = daemonQuery(server.socket_path, {'cmd' : "lookup", 'folder' : "04"})
+	assert reply['images'][0]['title'] == "THIRD GAME"
+
+def test_iso_rejects_unknown_menu(server):
+	reply = daemonQuery(server.socket_path, {'cmd' : "iso", 'menu' : "2"})
+	assert not reply['ok'] and 'error' in reply
+
+def test_refuses_live_socket(server):
+	with pytest.raises(OSError):
+		MenuDaemon(server.data_dir, server.socket_path, False)
+	assert daemonQuery(server.socket_path, {'cmd' : "list"})['ok']
+
+def test_refuses_non_socket(card):
+	socket_path = card + "/not-a-socket"
+	f = open(socket_path, "w")
+	f.write("keep me")
+	f.close()
+	with pytest.raises(OSError):
+		MenuDaemon(card, socket_path, False)
+	assert os.path.isfile(socket_path)
+
+def test_replaces_stale_socket(card):
+	socket_path = card + "/stale.sock"
+	s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	s.bind(socket_path)
+	s.close()
+	server = MenuDaemon(card, socket_path, False)
+	server.server_close()
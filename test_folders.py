@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+from folders import folderName, folderWidths, freeFolderNames
+
+def test_folder_name_width():
+	assert folderName(4) == "04"
+	assert folderName(4, 3) == "004"
+	assert folderName(1234, 3) == "1234"
+
+def test_free_folders_match_existing_width():
+	names = freeFolderNames(["01", "002", "003"])
+	assert next(names) == "004"
+	assert next(names) == "005"
+	assert next(freeFolderNames(["01", "007"])) == "002"
+
+def test_free_folders_on_empty_card():
+	assert next(freeFolderNames(["01"])) == "02"
+
+def test_mixed_widths():
+	assert folderWidths(["01", "002", "0004", "junk"]) == [3, 4]
+	assert folderWidths(["01", "02", "03"]) == [2]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import struct
+import tempfile
+
+import pytest
+
+import settings
+from integrity import checkImage
+from mdf import parseMDS, MDS_SESSION, MDS_TRACK, MDS_TRACK_EXTRA
+from scan import matchImage
+
+DATA_SECTORS = 40
+AUDIO_SECTORS = 10
+PREGAP = 150
+
+def bcd(value):
+	return ((value // 10) << 4) | (value % 10)
+
+def userData(sector):
+	""" The 2048 bytes of user data of a data track sector: a Saturn header in 0, a volume descriptor in 16 """
+
+	data = bytearray(2048)
+	if sector == 0:
+		data[0:16] = b"SEGA SEGASATURN "
+		data[settings.DISC_TITLE_OFFSET:settings.DISC_TITLE_OFFSET + 8] = b"MDF TEST"
+	elif sector == 16:
+		data[0:6] = b"\x01CD001"
+		struct.pack_into("<I", data, 80, DATA_SECTORS)
+	return bytes(data)
+
+def dataTrack(sector_size):
+	""" A data track of cooked (2048), raw (2352) or raw + subchannel (2448) sectors """
+
+	track = b""
+	for sector in range(0, DATA_SECTORS):
+		if sector_size == 2048:
+			track += userData(sector)
+			continue
+		frame = sector + 150
+		track += settings.CD_SYNC + bytes([bcd(frame // 4500), bcd((frame // 75) % 60), bcd(frame % 75), 1])
+		track += userData(sector) + bytes(288)
+		track += bytes(sector_size - 2352)
+	return track
+
+def mdsDescriptor(sector_size, subchannel):
+	""" An .mds with a mode 1 data track and an audio track, plus the three lead-in/lead-out blocks """
+
+	blocks = 5
+	track_offset = 0x58 + MDS_SESSION.size
+	extra_offset = track_offset + (blocks * MDS_TRACK.size)
+	header = bytearray(0x58)
+	header[0:16] = settings.MDS_SIGNATURE.encode('ascii')
+	header[16:18] = b"\x01\x05"
+	struct.pack_into("<H", header, 0x14, 1)
+	struct.pack_into("<I", header, 0x50, 0x58)
+
+	session = MDS_SESSION.pack(-PREGAP, DATA_SECTORS + PREGAP + AUDIO_SECTORS, 1, blocks, 3, 1, 2, 0, track_offset)
+	tracks = b""
+	for point in (0xA0, 0xA1, 0xA2):
+		tracks += MDS_TRACK.pack(0, 0, 0x14, 0, point, 0, 0, 0, 0, 0, 0, 0, 0, 0, b"", 0, 0, 0, 0, b"")
+	tracks += MDS_TRACK.pack(0xAA, subchannel, 0x14, 0, 1, 0, 0, 0, 0, 0, 2, 0, extra_offset, sector_size, b"", 0, 0, 1, 0, b"")
+	tracks += MDS_TRACK.pack(0xA9, subchannel, 0x10, 0, 2, 0, 0, 0, 0, 0, 2, 0, extra_offset + MDS_TRACK_EXTRA.size, sector_size, b"", DATA_SECTORS + PREGAP, DATA_SECTORS * sector_size, 1, 0, b"")
+	extra = MDS_TRACK_EXTRA.pack(PREGAP, DATA_SECTORS) + MDS_TRACK_EXTRA.pack(PREGAP, AUDIO_SECTORS)
+	return bytes(header) + session + tracks + extra
+
+@pytest.fixture
+def image_dir():
+	directory = tempfile.mkdtemp(prefix = "rmenu-")
+	yield directory
+	shutil.rmtree(directory, ignore_errors = True)
+
+def writeImage(directory, sector_size, subchannel):
+	f = open(directory + "/game.mdf", "wb")
+	f.write(dataTrack(sector_size) + (b"\x01" * sector_size * (PREGAP + AUDIO_SECTORS)))
+	f.close()
+	f = open(directory + "/game.mds", "wb")
+	f.write(mdsDescriptor(sector_size, subchannel))
+	f.close()
+	return matchImage(directory, "02", "game.mdf")
+
+def test_raw_with_subchannel(image_dir):
+	writeImage(image_dir, 2448, 8)
+	tracks = parseMDS(image_dir + "/game.mds")
+	assert len(tracks) == 2
+	assert tracks[0]['mode'] == "MODE1"
+	assert tracks[0]['sector_size'] == 2448
+	assert tracks[0]['subchannel_size'] == settings.MDS_SUBCHANNEL_SIZE
+	assert tracks[0]['data_offset'] == 16
+	assert tracks[0]['offset'] == 0
+	assert tracks[0]['length'] == DATA_SECTORS
+	# Only the first track has its pregap left out of the image
+	assert tracks[1]['mode'] == "AUDIO"
+	assert tracks[1]['offset'] == (DATA_SECTORS + PREGAP) * 2448
+	assert tracks[1]['length'] == AUDIO_SECTORS
+
+def test_cooked(image_dir):
+	writeImage(image_dir, 2048, 0)
+	tracks = parseMDS(image_dir + "/game.mds")
+	assert tracks[0]['sector_size'] == 2048
+	assert tracks[0]['subchannel_size'] == 0
+	assert tracks[0]['data_offset'] == 0
+	assert tracks[0]['length'] == DATA_SECTORS
+
+def test_check_whole_and_truncated(image_dir):
+	i = writeImage(image_dir, 2448, 8)
+	assert checkImage(i) == (True, [])
+
+	size = os.path.getsize(image_dir + "/game.mdf")
+	f = open(image_dir + "/game.mdf", "rb+")
+	f.truncate(size - (2448 * 100))
+	f.close()
+	ok, problems = checkImage(i)
+	assert ok is False
+	assert problems[0].startswith("truncated")
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+from scan import matchImage
+
+def test_image_extensions():
+	assert matchImage(".", "02", "Game.iso")['is_iso']
+	assert matchImage(".", "02", "GAME.CDI")['is_cdi']
+	assert matchImage(".", "02", "game.img")['is_ccd']
+	assert matchImage(".", "02", "game.mdf")['is_mdf']
+	assert matchImage(".", "02", "game.cue")['is_cue']
+
+def test_extension_only_at_end_of_name():
+	assert matchImage(".", "02", "Game.iso.md5") is None
+	assert matchImage(".", "02", "Paradiso notes.txt") is None
+	assert matchImage(".", "02", "game.cdi.bak") is None
+	assert matchImage(".", "02", "image.mds") is None